@@ -4,6 +4,7 @@ import streamlit as st
 from src.ChatSession.view import ChatSessionView
 from src.ChatMessage.view import ChatMessageView
 from src.RagSource.view import RAGFileView
+from src.base.services import invalidate_session_services
 
 def render_sidebar():
     """Render chat sidebar"""
@@ -20,6 +21,7 @@ def render_sidebar():
     
     if st.sidebar.button("← Back to Dashboard",use_container_width=True):
         st.session_state.current_chat = None
+        invalidate_session_services()
         st.rerun()
     st.sidebar.divider()
 
@@ -17,8 +17,14 @@
     - SCOPED_FILE_URL: Stores a scoped/temporary URL for restricted access
     - CHUNK: Contains the actual text segment from the PDF
     - CATEGORY: Stores the document classification for filtering purposes
+    - CHUNK_INDEX: Ordinal of the chunk within its document
+    - START_OFFSET / END_OFFSET: Character range of the chunk in the parsed document text
+    - CONTENT_HASH: Hex SHA-256 of CHUNK, used to skip duplicate chunks
+    - EMBEDDING: EMBED_TEXT_768 vector of CHUNK, filled by the in-warehouse ingestion
     
     Usage Notes:
+    - This script drops the table; to add new columns to a table that already holds chunks,
+      run chunk_migration.sql instead
     - Ensure proper indexing based on your query patterns
     - Consider partitioning for large datasets
     - Monitor CHUNK column usage as it stores large text data
@@ -39,19 +45,42 @@ CREATE OR REPLACE TABLE DOCS_CHUNKS_TABLE (
     
     CHUNK VARCHAR(16777216) COMMENT 'Extracted text segment from the PDF document',
     
-    CATEGORY VARCHAR(16777216) COMMENT 'Document classification category for filtering and organization'
+    CATEGORY VARCHAR(16777216) COMMENT 'Document classification category for filtering and organization',
+    
+    CHUNK_INDEX NUMBER(38,0) COMMENT 'Ordinal of the chunk within its document, starting at 0',
+    
+    START_OFFSET NUMBER(38,0) COMMENT 'Character offset of the chunk in the parsed document text',
+    
+    END_OFFSET NUMBER(38,0) COMMENT 'Character offset just past the end of the chunk',
+    
+    CONTENT_HASH VARCHAR(64) COMMENT 'Hex SHA-256 of CHUNK',
+    
+    EMBEDDING VECTOR(FLOAT, 768) COMMENT 'EMBED_TEXT_768 vector of the chunk; NULL for rows inserted from Python'
 );
 
 
+-- Set-based ingestion of every file under a directory that is not in DOCS_INDEX_MANIFEST yet
+-- (see IncrementalIndexer.ingest_directory, which also refreshes the manifest)
 -- insert into DOCS_CHUNKS_TABLE (relative_path, size, file_url,
---                             scoped_file_url, chunk)
+--                             scoped_file_url, chunk, category, chunk_index,
+--                             start_offset, end_offset, content_hash, embedding)
 
---     select relative_path, 
---             size,
---             file_url, 
---             build_scoped_file_url(@docs, relative_path) as scoped_file_url,
---             func.chunk as chunk
+--     select d.relative_path, 
+--             d.size,
+--             d.file_url, 
+--             build_scoped_file_url(@docs, d.relative_path) as scoped_file_url,
+--             func.chunk as chunk,
+--             null as category,
+--             func.chunk_index,
+--             func.start_offset,
+--             func.end_offset,
+--             sha2(func.chunk, 256) as content_hash,
+--             SNOWFLAKE.CORTEX.EMBED_TEXT_768('e5-base-v2', func.chunk) as embedding
 --     from 
---         directory(@docs),
+--         directory(@docs) d
+--         left join DOCS_INDEX_MANIFEST m on m.relative_path = d.relative_path,
 --         TABLE(text_chunker (TO_VARCHAR(SNOWFLAKE.CORTEX.PARSE_DOCUMENT(@docs, 
---                               relative_path, {'mode': 'LAYOUT'})))) as func;
\ No newline at end of file
+--                               d.relative_path, {'mode': 'LAYOUT'})))
+--               OVER (PARTITION BY d.relative_path)) as func
+--     where startswith(d.relative_path, '<session_id>/')
+--       and (m.relative_path is null or m.md5 != d.md5);
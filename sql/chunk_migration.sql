@@ -0,0 +1,35 @@
+/*
+    File: chunk_migration.sql
+    Description: Brings an existing DOCS_CHUNKS_TABLE up to the columns defined in chunk.sql
+
+    chunk.sql drops and recreates the table, which throws away every indexed chunk.
+    Deployments that already hold chunks run this script instead; it is idempotent,
+    so running it against an up-to-date table changes nothing.
+
+    Columns added:
+    - CHUNK_INDEX, START_OFFSET, END_OFFSET: Position of the chunk in its document (NULL for older rows)
+    - CONTENT_HASH: Hex SHA-256 of CHUNK
+    - EMBEDDING: EMBED_TEXT_768 vector of CHUNK, filled by the in-warehouse ingestion
+
+    CONTENT_HASH is then backfilled for rows written before it existed, once, so readers
+    such as the lexical index sync can compare the raw column instead of hashing CHUNK per query.
+*/
+
+ALTER TABLE DOCS_CHUNKS_TABLE ADD COLUMN IF NOT EXISTS
+    CHUNK_INDEX NUMBER(38,0) COMMENT 'Ordinal of the chunk within its document, starting at 0';
+
+ALTER TABLE DOCS_CHUNKS_TABLE ADD COLUMN IF NOT EXISTS
+    START_OFFSET NUMBER(38,0) COMMENT 'Character offset of the chunk in the parsed document text';
+
+ALTER TABLE DOCS_CHUNKS_TABLE ADD COLUMN IF NOT EXISTS
+    END_OFFSET NUMBER(38,0) COMMENT 'Character offset just past the end of the chunk';
+
+ALTER TABLE DOCS_CHUNKS_TABLE ADD COLUMN IF NOT EXISTS
+    CONTENT_HASH VARCHAR(64) COMMENT 'Hex SHA-256 of CHUNK';
+
+ALTER TABLE DOCS_CHUNKS_TABLE ADD COLUMN IF NOT EXISTS
+    EMBEDDING VECTOR(FLOAT, 768) COMMENT 'EMBED_TEXT_768 vector of the chunk; NULL for rows inserted from Python';
+
+UPDATE DOCS_CHUNKS_TABLE
+SET CONTENT_HASH = SHA2(CHUNK, 256)
+WHERE CONTENT_HASH IS NULL;
@@ -0,0 +1,30 @@
+/*
+    File: conversation_summary.sql
+    Description: Creates the rolling conversation summaries used for query rewriting
+    
+    Table: CHAT_SESSION_SUMMARIES
+    Purpose: Keeps one compact summary per chat session, updated with each new turn,
+    so follow-up questions are rewritten from the summary instead of the full history.
+    
+    Column Details:
+    - SESSION_ID: Chat session the summary belongs to
+    - SUMMARY: Summary of the conversation so far
+    - LAST_MESSAGE_ID: Last message folded into the summary
+    - TURNS: Number of turns folded into the summary
+    - UPDATED_AT: When the summary was last updated
+*/
+
+CREATE TABLE IF NOT EXISTS CHAT_SESSION_SUMMARIES (
+    SESSION_ID VARCHAR(36) NOT NULL COMMENT 'Chat session the summary belongs to',
+    
+    SUMMARY TEXT NOT NULL COMMENT 'Rolling summary of the conversation',
+    
+    LAST_MESSAGE_ID VARCHAR(36) COMMENT 'Last message folded into the summary',
+    
+    TURNS NUMBER(38,0) NOT NULL DEFAULT 0 COMMENT 'Number of turns folded into the summary',
+    
+    UPDATED_AT TIMESTAMP_NTZ(9) DEFAULT CURRENT_TIMESTAMP() COMMENT 'Time the summary was last updated',
+    
+    PRIMARY KEY (SESSION_ID),
+    FOREIGN KEY (SESSION_ID) REFERENCES CHAT_SESSIONS(SESSION_ID)
+);
@@ -0,0 +1,26 @@
+/*
+    File: manifest.sql
+    Description: Creates the manifest used for incremental re-indexing of staged documents
+    
+    Table: DOCS_INDEX_MANIFEST
+    Purpose: Remembers which version (stage MD5) of every file has been chunked into
+    DOCS_CHUNKS_TABLE, so refreshes only re-process new or changed files.
+    
+    Column Details:
+    - RELATIVE_PATH: Relative path of the file in the @docs stage
+    - MD5: MD5 reported by LIST @docs when the file was indexed
+    - CHUNK_COUNT: Number of chunks written for the file
+    - INDEXED_AT: When the file was last indexed
+*/
+
+CREATE TABLE IF NOT EXISTS DOCS_INDEX_MANIFEST (
+    RELATIVE_PATH VARCHAR(16777216) NOT NULL COMMENT 'Relative path to the file within the docs stage',
+    
+    MD5 VARCHAR(32) NOT NULL COMMENT 'Stage MD5 of the indexed version of the file',
+    
+    CHUNK_COUNT NUMBER(38,0) NOT NULL COMMENT 'Number of chunks written to DOCS_CHUNKS_TABLE',
+    
+    INDEXED_AT TIMESTAMP_NTZ(9) DEFAULT CURRENT_TIMESTAMP() COMMENT 'Time the file was last indexed',
+    
+    PRIMARY KEY (RELATIVE_PATH)
+);
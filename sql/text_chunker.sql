@@ -1,26 +1,89 @@
+/*
+    File: text_chunker.sql
+    Description: Vectorized UDTF splitting parsed document text into overlapping chunks
+
+    Call it partitioned by document so each partition is handed to the handler
+    as one pandas DataFrame:
+
+        TABLE(text_chunker(TO_VARCHAR(SNOWFLAKE.CORTEX.PARSE_DOCUMENT(@docs, relative_path, {'mode': 'LAYOUT'})))
+              OVER (PARTITION BY relative_path))
+
+    Output Columns:
+    - CHUNK: Text of the chunk
+    - CHUNK_INDEX: Ordinal of the chunk within its document, starting at 0
+    - START_OFFSET: Character offset of the chunk in the parsed text (NULL if it cannot be located)
+    - END_OFFSET: Character offset just past the end of the chunk (NULL if it cannot be located)
+
+    Chunks are sized in approximate e5-base-v2 tokens (the model behind EMBED_TEXT_768)
+    so they fit its 512 token window; counting is done with a word/punctuation
+    regex because the UDF sandbox cannot download a tokenizer vocabulary.
+*/
+
 create or replace function text_chunker(pdf_text string)
-returns table (chunk varchar)
+returns table (chunk varchar, chunk_index number, start_offset number, end_offset number)
 language python
 runtime_version = '3.9'
 handler = 'text_chunker'
-packages = ('snowflake-snowpark-python', 'langchain')
+packages = ('snowflake-snowpark-python', 'langchain', 'pandas')
 as
 $$
-from snowflake.snowpark.types import StringType, StructField, StructType
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+import re
 import pandas as pd
+from _snowflake import vectorized
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+CHUNK_TOKENS = 384      # Leaves headroom below the 512 token window of e5-base-v2
+OVERLAP_TOKENS = 64     # Lets neighbouring chunks share some context
+
+# Word pieces: runs of letters/digits count roughly one token per 4 characters, punctuation one each
+TOKEN_PATTERN = re.compile(r"\w{1,4}|[^\w\s]")
+
+def approx_tokens(text: str) -> int:
+    return len(TOKEN_PATTERN.findall(text))
+
+# One splitter for every partition the handler process sees
+SPLITTER = RecursiveCharacterTextSplitter(
+    chunk_size = CHUNK_TOKENS,
+    chunk_overlap = OVERLAP_TOKENS,
+    length_function = approx_tokens
+)
+
+def locate(text: str, chunks):
+    """
+    Start offset of each chunk in text, or None if it is not found.
+    Offsets are searched for here because the splitter's add_start_index assumes
+    chunk_overlap is measured in characters, which is wrong for a token length function.
+    Each chunk starts after the previous chunk's start, so the search resumes just past it.
+    """
+    starts, previous = [], -1
+    for chunk in chunks:
+        start = text.find(chunk, previous + 1)
+        if start == -1:
+            starts.append(None)
+            continue
+        starts.append(start)
+        previous = start
+    return starts
 
 class text_chunker:
 
-    def process(self, pdf_text: str):
-        
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size = 1512, #Adjust this as you see fit
-            chunk_overlap  = 256, #This let's text have some form of overlap. Useful for keeping chunks contextual
-            length_function = len
-        )
-    
-        chunks = text_splitter.split_text(pdf_text)
-        df = pd.DataFrame(chunks, columns=['chunks'])
-        
-        yield from df.itertuples(index=False, name=None)
\ No newline at end of file
+    @vectorized(input=pd.DataFrame)
+    def end_partition(self, df: pd.DataFrame):
+        chunks, indexes, starts, ends = [], [], [], []
+        for pdf_text in df[0]:
+            if not pdf_text:
+                continue
+            texts = SPLITTER.split_text(pdf_text)
+            for chunk, start in zip(texts, locate(pdf_text, texts)):
+                chunks.append(chunk)
+                indexes.append(len(indexes))
+                starts.append(start)
+                ends.append(None if start is None else start + len(chunk))
+        # Nullable integers, so unlocated offsets are written as NULL
+        return pd.DataFrame({
+            0: chunks,
+            1: indexes,
+            2: pd.array(starts, dtype="Int64"),
+            3: pd.array(ends, dtype="Int64"),
+        })
+$$;
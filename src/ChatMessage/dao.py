@@ -1,4 +1,5 @@
-from typing import List
+from datetime import datetime
+from typing import List, Optional, Tuple
 from src.base.dao import BaseDAO
 from src.ChatMessage.model import ChatMessage
 
@@ -32,22 +33,42 @@ class ChatMessageDAO(BaseDAO):
             print(f"Error creating chat message: {e}")
             return None
 
-    def getMessage(self, session_id: str, limit: int = 50) -> List[ChatMessage]:
-        """Get messages for a chat session"""
-        query = """
+    def add_many(self, records: List[ChatMessage]) -> int:
+        """Insert messages in one transaction, in the given order; raises on failure"""
+        return self.bulk_insert(
+            "CHAT_MESSAGES",
+            ("message_id", "session_id", "role", "content", "created_at"),
+            [(r.message_id, r.session_id, r.role, r.content, r.created_at) for r in records],
+        )
+
+    def getMessage(self, session_id: str, limit: int = 50,
+                   before: Optional[Tuple[datetime, str]] = None) -> List[ChatMessage]:
+        """
+        Get the newest messages of a chat session, oldest first
+        Args:
+            limit: Page size
+            before: Keyset cursor (created_at, message_id) of the oldest message already loaded;
+                only messages older than it are returned
+        """
+        cursor = ""
+        params = [session_id]
+        if before is not None:
+            cursor = "AND (created_at < ? OR (created_at = ? AND message_id < ?))"
+            params += [before[0], before[0], before[1]]
+        query = f"""
         SELECT message_id, session_id, role, content, created_at FROM CHAT_MESSAGES
-        WHERE session_id = ?
-        ORDER BY created_at ASC
+        WHERE session_id = ? {cursor}
+        ORDER BY created_at DESC, message_id DESC
         LIMIT ?
         """
-        result = self.execute_query(query, (session_id, limit))
+        result = self.execute_query(query, tuple(params + [limit]))
         return [ChatMessage(
             message_id=row['MESSAGE_ID'],
             session_id=row['SESSION_ID'],
             role=row['ROLE'],
             content=row['CONTENT'],
             created_at=row['CREATED_AT']
-        ) for row in result]
+        ) for row in reversed(result)]
     
     def delete_by_session(self, session_id: str) -> bool:
         """Soft delete chat session"""
@@ -0,0 +1,66 @@
+from collections import deque
+from datetime import datetime
+from typing import Deque, List, Optional, Tuple
+
+from src.ChatMessage.model import ChatMessage
+
+class ChatHistoryManager:
+    """
+    Recent turns of a chat in a bounded ring buffer, plus older pages loaded on demand.
+    Rendering cost stays constant however long the notebook gets.
+    """
+
+    def __init__(self, data: List[ChatMessage], slide_window: int, capacity: int = 50, page_size: int = 20):
+        """
+        Args:
+            data (List[ChatMessage]): Newest page of messages, oldest first.
+            slide_window (int): Messages given to the model as chat history.
+            capacity (int): Recent messages kept in memory; the oldest fall out as new ones arrive.
+            page_size (int): Messages fetched per "load older" request.
+        """
+        self.chat_history: Deque[ChatMessage] = deque(data, maxlen=capacity)
+        self.older: List[ChatMessage] = []
+        self.slide_window: int = slide_window
+        self.page_size: int = page_size
+        self.has_older: bool = len(data) >= page_size
+        self._cursor: Optional[Tuple[datetime, str]] = self._key(data[0]) if data else None
+
+    @staticmethod
+    def _key(message: ChatMessage) -> Tuple[datetime, str]:
+        return (message.created_at, message.message_id)
+
+    @property
+    def cursor(self) -> Optional[Tuple[datetime, str]]:
+        """Keyset cursor of the oldest message loaded so far"""
+        return self._cursor
+
+    def push(self, data: ChatMessage):
+        if len(self.chat_history) == self.chat_history.maxlen:
+            evicted = self.chat_history[0]
+            if self.older:
+                # Older pages are already on screen, so the evicted turn joins them
+                self.older.append(evicted)
+            else:
+                # Dropped from memory; "load older" fetches it again from the new oldest turn
+                self.has_older = True
+                self._cursor = self._key(self.chat_history[1])
+        self.chat_history.append(data)
+        if self._cursor is None:
+            self._cursor = self._key(data)
+
+    def prepend_older(self, page: List[ChatMessage]):
+        """Add a page of older messages (oldest first) fetched with `cursor`"""
+        self.older[:0] = page
+        self.has_older = len(page) >= self.page_size
+        if page:
+            self._cursor = self._key(page[0])
+
+    def messages(self) -> List[ChatMessage]:
+        """Everything loaded, oldest first"""
+        return self.older + list(self.chat_history)
+
+    def get(self) -> List[ChatMessage]:
+        """The `slide_window` most recent messages, excluding the question just pushed"""
+        recent = list(self.chat_history)
+        start_index = max(0, len(recent) - self.slide_window)
+        return recent[start_index:-1]
@@ -1,61 +1,87 @@
 from datetime import datetime
-from typing import List, Optional, Tuple
+from typing import Iterator, List, Optional, Tuple
 import uuid
 import streamlit as st
 
+from src.ChatMessage.history import ChatHistoryManager
 from src.ChatMessage.model import ChatMessage
 from src.ChatSession.model import ChatSession
-from src.ChatSession.repository import ChatRepository
-from src.RagSource.repository import RagSourceRepository
-from src.base.stage import StageManager
-from src.base.rag import RAG_from_scratch
-
-class ChatHistoryManager:
-    def __init__(self,data:List[ChatMessage],slide_window:int):
-        self.chat_history:List[ChatMessage]   = data
-        self.slide_window:int = slide_window
-
-    def push(self,data:ChatMessage):
-        self.chat_history.append(data)
-    
-    def get(self) -> List[ChatMessage]:        
-        start_index = max(0, len(self.chat_history) - self.slide_window)
-        return self.chat_history[start_index:-1]
+from src.base.services import get_chat_repository, get_conversation_memory, get_session_services, get_stage_dao
 
 class ChatMessageView:
     def __init__(self, chat_session:ChatSession,slide_window: int = 7):
         self.chat_session:ChatSession   = chat_session
         
-        self.stage_manager              = StageManager("docs")
-        self.chat_repo                  = self.chat_repo = ChatRepository()
-        self.chat_history               = ChatHistoryManager(data=self.chat_repo.getMessage(chat_session.session_id,limit=slide_window),slide_window=7)
-        rag_repo                        = RagSourceRepository()
-        file_list                       = rag_repo.get_files(chat_session.session_id)
-        self.rag_service                = RAG_from_scratch(file_list=[file.name for file in file_list])
+        # Repositories and the session's RAG service survive reruns; see src/base/services.py
+        services                        = get_session_services(chat_session.session_id, slide_window)
+        self.stage_dao                  = get_stage_dao()
+        self.chat_repo                  = get_chat_repository()
+        self.chat_history:ChatHistoryManager = services.chat_history
+        self.rag_service                = services.rag_service
+        self.memory                     = get_conversation_memory()
     
+    def _rewrite_context(self) -> Tuple[List[ChatMessage], Optional[str]]:
+        """The last turn plus the rolling summary of everything before it"""
+        summary = self.memory.get(self.chat_session.session_id)
+        return self.chat_history.get()[-2:], summary.summary if summary else None
+
     def answer_question(self, question: str) -> Tuple[str, Optional[List[str]]]:
         """Process question through RAG service"""
+        history_chat, conversation_summary = self._rewrite_context()
         return self.rag_service.query(
             query=question,
-            history_chat=self.chat_history.get(),
+            history_chat=history_chat,
+            conversation_summary=conversation_summary,
+        )
+
+    def answer_question_stream(self, question: str) -> Tuple[Iterator[str], Optional[List[str]]]:
+        """Process question through RAG service, streaming the answer"""
+        history_chat, conversation_summary = self._rewrite_context()
+        return self.rag_service.query_stream(
+            query=question,
+            history_chat=history_chat,
+            conversation_summary=conversation_summary,
         )
 
     def display_related_documents(self, relative_paths: List[str]):
         """Display related documents in sidebar"""
         if relative_paths:
+            url_links = self.stage_dao.get_file_urls(sorted(relative_paths), expiration=360)
             with st.sidebar.expander("Related Documents"):
                 for path in relative_paths:
-                    cmd = f"select GET_PRESIGNED_URL(@docs, '{path}', 360) as URL_LINK from directory(@docs)"
-                    self.connector.connect()
-                    df_url_link = self.connector.session.sql(cmd).to_pandas()
-                    url_link = df_url_link._get_value(0, 'URL_LINK')
-                    st.sidebar.markdown(f"Doc: [{path}]({url_link})")
+                    url_link = url_links.get(path)
+                    if url_link:
+                        st.sidebar.markdown(f"Doc: [{path}]({url_link})")
+
+    def render_unsaved_warning(self):
+        """Warn about messages of this chat that could not be stored, with a way to retry them"""
+        unsaved = self.chat_repo.unsaved_messages(self.chat_session.session_id)
+        if not unsaved:
+            return
+        st.warning(f"{unsaved} messages of this chat could not be saved and will be lost when the app restarts.")
+        if st.button("Retry saving", use_container_width=True):
+            with st.spinner("Saving..."):
+                saved = self.chat_repo.retry_unsaved(self.chat_session.session_id)
+            if saved:
+                st.rerun()
+            st.error("Saving failed again; the messages are kept for another retry.")
 
     def render(self):
         """Render chat interface"""
         st.title(f"💬 {self.chat_session.title}")
         
-        for message in self.chat_history.chat_history:
+        if self.chat_history.has_older:
+            if st.button("Load older messages", use_container_width=True):
+                self.chat_history.prepend_older(self.chat_repo.getMessage(
+                    self.chat_session.session_id,
+                    limit=self.chat_history.page_size,
+                    before=self.chat_history.cursor
+                ))
+                st.rerun()
+
+        self.render_unsaved_warning()
+
+        for message in self.chat_history.messages():
             with st.chat_message(message.role):
                 st.markdown(message.content)
         
@@ -74,23 +100,21 @@ class ChatMessageView:
                 with st.chat_message("user"):
                     st.markdown(userQuestion.content)
             
-                # Generate response
+                # Generate response, writing tokens as they arrive
                 with st.chat_message("assistant"):
-                    message_placeholder = st.empty()
-                    
                     with st.spinner("Thinking..."):
-                        response, relative_paths = self.answer_question(question)
-                        
-                        
-                        modelRespone = ChatMessage(
-                            session_id=self.chat_session.session_id,
-                            message_id=str(uuid.uuid4()),
-                            role="assistant",
-                            content= response,
-                            created_at=datetime.now()
-                        )
-                        if self.chat_repo.add_message(modelRespone):
-                            self.chat_history.push(modelRespone)
-                            message_placeholder.markdown(response)
-                        
+                        stream, relative_paths = self.answer_question_stream(question)
+                    response = st.write_stream(stream)
 
+                    modelRespone = ChatMessage(
+                        session_id=self.chat_session.session_id,
+                        message_id=str(uuid.uuid4()),
+                        role="assistant",
+                        content= response,
+                        created_at=datetime.now()
+                    )
+                    if self.chat_repo.add_message(modelRespone):
+                        self.chat_history.push(modelRespone)
+                        # Folded in the background; the next question waits for it if needed
+                        self.memory.update_async(self.chat_session.session_id, [userQuestion, modelRespone])
+                    self.display_related_documents(relative_paths)
@@ -0,0 +1,172 @@
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import asdict
+from typing import Deque, List, Optional
+
+from src.base.connector import TRANSIENT_ERRORS
+from src.ChatMessage.dao import ChatMessageDAO
+from src.ChatMessage.model import ChatMessage
+
+class MessageWriteQueue:
+    """
+    Write-behind persistence of chat messages.
+    `submit` returns immediately; one background thread inserts queued messages in batches,
+    in submission order, so every session's messages are stored in the order they were sent.
+    Messages that cannot be written for now are kept aside per session until `retry_failed` re-queues them;
+    messages the table rejects are dead-lettered to a local file instead.
+    """
+
+    def __init__(self, message_dao: Optional[ChatMessageDAO] = None, batch_size: int = 50,
+                 flush_interval: float = 0.5, max_retries: int = 5, backoff: float = 0.5,
+                 max_failed: int = 1000, dead_letter_path: str = ".cache/dead_messages.jsonl"):
+        """
+        Args:
+            message_dao (ChatMessageDAO, optional): DAO used for the inserts.
+            batch_size (int): Most messages written per transaction.
+            flush_interval (float): Seconds to wait for more messages before writing a partial batch.
+            max_retries (int): Attempts per batch after connection or timeout errors; after other errors the batch
+                is written row by row and only the rejected messages are dead-lettered.
+            backoff (float): Base delay in seconds between attempts, doubled after each failure.
+            max_failed (int): Most unwritten messages kept for a retry; the oldest are dropped beyond it.
+            dead_letter_path (str): JSON lines file for messages the table rejects outright; they are never retried.
+        """
+        self.message_dao = message_dao or ChatMessageDAO()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_failed = max_failed
+        self.dead_letter_path = dead_letter_path
+        self._failed: Deque[ChatMessage] = deque()
+        self._failed_lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+        self._queue: "queue.Queue[ChatMessage]" = queue.Queue()
+        self._closed = threading.Event()
+        self._worker = threading.Thread(target=self._run, name="message-writer", daemon=True)
+        self._worker.start()
+
+    def submit(self, record: ChatMessage) -> None:
+        """Queue a message for insertion"""
+        if self._closed.is_set():
+            raise RuntimeError("Message write queue is closed")
+        self._queue.put(record)
+
+    @property
+    def pending(self) -> int:
+        """Messages submitted but not yet written"""
+        return self._queue.unfinished_tasks
+
+    def failed(self, session_id: str) -> int:
+        """Messages of a session that could not be written"""
+        with self._failed_lock:
+            return sum(1 for record in self._failed if record.session_id == session_id)
+
+    def retry_failed(self, session_id: str) -> int:
+        """Re-queue a session's unwritten messages ahead of anything submitted afterwards; returns how many"""
+        retry = self.discard_failed(session_id)
+        for record in retry:
+            self.submit(record)
+        return len(retry)
+
+    def discard_failed(self, session_id: str) -> List[ChatMessage]:
+        """Remove and return a session's unwritten messages"""
+        with self._failed_lock:
+            taken = [record for record in self._failed if record.session_id == session_id]
+            self._failed = deque(record for record in self._failed if record.session_id != session_id)
+        return taken
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until every submitted message has been handled; False on timeout"""
+        with self._queue.all_tasks_done:
+            return self._queue.all_tasks_done.wait_for(lambda: self._queue.unfinished_tasks == 0, timeout)
+
+    def close(self, timeout: Optional[float] = 10) -> None:
+        """Stop accepting messages, write what is queued and stop the worker; safe to call at exit"""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        if not self.flush(timeout):
+            self.logger.error(f"Shut down with {self.pending} chat messages unwritten")
+        if self._failed:
+            self.logger.error(f"Shut down with {len(self._failed)} chat messages that failed to write")
+        self._worker.join(timeout=1)
+
+    def _next_batch(self) -> List[ChatMessage]:
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while not (self._closed.is_set() and self._queue.unfinished_tasks == 0):
+            batch = self._next_batch()
+            if not batch:
+                continue
+            try:
+                self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write(self, batch: List[ChatMessage]) -> None:
+        # A failing batch is retried before later messages are written, which keeps the order
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                self.message_dao.add_many(batch)
+                return
+            except TRANSIENT_ERRORS as e:
+                self.logger.warning(f"Writing {len(batch)} chat messages failed (attempt {attempt}): {str(e)}")
+                if attempt < self.max_retries:
+                    time.sleep(self.backoff * 2 ** (attempt - 1) * (1 + random.random()))
+            except Exception as e:
+                # Not worth retrying as a whole; write row by row so one bad message cannot hold back the rest
+                self.logger.error(f"Writing {len(batch)} chat messages failed, isolating the bad ones: {str(e)}")
+                self._write_each(batch)
+                return
+        self.logger.error(f"Giving up on {len(batch)} chat messages after {self.max_retries} attempts")
+        self._set_aside(batch)
+
+    def _write_each(self, batch: List[ChatMessage]) -> None:
+        for index, record in enumerate(batch):
+            try:
+                self.message_dao.add_many([record])
+            except TRANSIENT_ERRORS as e:
+                self.logger.warning(f"Writing chat messages failed while isolating bad ones: {str(e)}")
+                self._set_aside(batch[index:])
+                return
+            except Exception as e:
+                self._dead_letter(record, e)
+
+    def _dead_letter(self, record: ChatMessage, error: Exception) -> None:
+        self.logger.error(f"Chat message {record.message_id} of session {record.session_id} was rejected: {str(error)}")
+        try:
+            directory = os.path.dirname(self.dead_letter_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.dead_letter_path, "a", encoding="utf-8") as file:
+                file.write(json.dumps({**asdict(record), "error": str(error)}, default=str) + "\n")
+        except OSError as e:
+            self.logger.error(f"Failed to dead-letter chat message {record.message_id}: {str(e)}")
+
+    def _set_aside(self, batch: List[ChatMessage]) -> None:
+        with self._failed_lock:
+            self._failed.extend(batch)
+            overflow = len(self._failed) - self.max_failed
+            for _ in range(max(overflow, 0)):
+                self._failed.popleft()
+        if overflow > 0:
+            self.logger.error(f"Dropped {overflow} unwritten chat messages beyond the {self.max_failed} kept for retry")
@@ -1,16 +1,22 @@
-from typing import Dict, List, Optional
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
 
 from src.ChatMessage.dao import ChatMessageDAO
 from src.ChatSession.dao import ChatSessionDAO
 from src.ChatSession.model import ChatSession
 from src.RagSource.dao import RagSourceDAO, SessionFileDAO
 from src.ChatMessage.model import ChatMessage
-from stage.dao import SnowflakeStageDAO
+from src.ChatMessage.writer import MessageWriteQueue
+from src.stage.dao import SnowflakeStageDAO
 
 class ChatRepository:
     """Repository class to coordinate DAO operations"""
-    def __init__(self):
-        
+    def __init__(self, writer: Optional[MessageWriteQueue] = None):
+        """
+        Args:
+            writer (MessageWriteQueue, optional): When set, messages are written behind the UI instead of inline.
+        """
+        self.writer = writer
         self.session_dao = ChatSessionDAO()
         self.message_dao = ChatMessageDAO()
         self.source_dao  = RagSourceDAO()
@@ -27,15 +33,41 @@ class ChatRepository:
 
     def add_message(self, record:ChatMessage) -> bool:
         """Add message with associated RAG sources"""
+        if self.writer is not None:
+            try:
+                # Earlier messages that failed to write go first, so the session keeps its order
+                self.writer.retry_failed(record.session_id)
+                self.writer.submit(record)
+            except RuntimeError:
+                return False
+            return True
         return self.message_dao.add(record)
+
+    def unsaved_messages(self, session_id: str) -> int:
+        """Messages of the session shown in the UI that could not be stored"""
+        return self.writer.failed(session_id) if self.writer is not None else 0
+
+    def retry_unsaved(self, session_id: str) -> bool:
+        """Queue the session's unsaved messages again and wait for them; True once none are left"""
+        if self.writer is None or not self.writer.retry_failed(session_id):
+            return True
+        self.writer.flush(timeout=10)
+        return self.writer.failed(session_id) == 0
         
     def get_session_statistics(self, session_id: str) -> Dict:
         return self.session_dao.get_session_statistics(session_id,)
     
-    def getMessage(self, session_id: str, limit: int = 50)->List[ChatMessage]:
-        return self.message_dao.getMessage(session_id,limit)
+    def getMessage(self, session_id: str, limit: int = 50, before: Optional[Tuple[datetime, str]] = None)->List[ChatMessage]:
+        if self.writer is not None:
+            # Read your own writes: messages still queued would otherwise be missing
+            self.writer.flush(timeout=5)
+        return self.message_dao.getMessage(session_id,limit,before)
 
     def delete(self, session_id: str) -> bool:
+        if self.writer is not None:
+            # Queued messages of the session must land before it is deleted
+            self.writer.flush(timeout=10)
+            self.writer.discard_failed(session_id)
         if(not self.stag_dao.remove_dir(dir_name=session_id)):
             return False
         if(not self.session_file_dao.delete_by_session_id(session_id=session_id)):
@@ -3,7 +3,7 @@ import streamlit as st
 from datetime import datetime
 
 from src.ChatSession.model import ChatSession
-from src.ChatSession.repository import ChatRepository
+from src.base.services import get_chat_repository, get_conversation_memory, invalidate_session_services
 
 init_state = {
     'creating_new' : False,
@@ -13,8 +13,10 @@ init_state = {
 
 class ChatSessionView:
     def __init__(self):
-        self.chat_repo = ChatRepository()
-        st.session_state.chat_history = self.chat_repo.get_all()
+        self.chat_repo = get_chat_repository()
+        # Loaded once per browser session; create and delete below keep the list current
+        if 'chat_history' not in st.session_state:
+            st.session_state.chat_history = self.chat_repo.get_all()
         
         for key,value in init_state.items():
             if key not in st.session_state:
@@ -147,6 +149,7 @@ class ChatSessionView:
             if st.button("Open Chat", key=f"btn_{chat.session_id}", use_container_width=True):
                 st.session_state.current_chat = chat
                 st.session_state.current_view = "chat"
+                invalidate_session_services()
                 st.rerun()
 
     @st.dialog("delete confirmation")
@@ -177,6 +180,8 @@ class ChatSessionView:
         with col2:
             if st.button("🗑️ Delete", key=f"confirm_delete_{chat.session_id}", type="primary"):
                 self.chat_repo.delete(chat.session_id)
+                get_conversation_memory().forget(chat.session_id)
+                invalidate_session_services(chat.session_id)
                 st.session_state.chat_history.remove(chat)
                 st.session_state.delete_confirmation = None
                 st.rerun()
@@ -0,0 +1,66 @@
+from typing import Optional
+from src.ConversationMemory.model import ConversationSummary
+from src.base.dao import BaseDAO
+
+class ConversationSummaryDAO(BaseDAO):
+
+    def create_table(self):
+        """Create conversation summary table if not exists"""
+        query = """
+        CREATE TABLE IF NOT EXISTS CHAT_SESSION_SUMMARIES (
+            SESSION_ID VARCHAR(36) NOT NULL,
+            SUMMARY TEXT NOT NULL,
+            LAST_MESSAGE_ID VARCHAR(36),
+            TURNS NUMBER(38,0) NOT NULL DEFAULT 0,
+            UPDATED_AT TIMESTAMP_NTZ(9) DEFAULT CURRENT_TIMESTAMP(),
+            PRIMARY KEY (SESSION_ID),
+            FOREIGN KEY (SESSION_ID) REFERENCES CHAT_SESSIONS(SESSION_ID)
+        )
+        """
+        self.execute_query(query)
+
+    def get(self, session_id: str) -> Optional[ConversationSummary]:
+        """Get the rolling summary of a chat session"""
+        query = """
+        SELECT session_id, summary, last_message_id, turns, updated_at FROM CHAT_SESSION_SUMMARIES
+        WHERE session_id = ?
+        """
+        result = self.execute_query(query, (session_id,))
+        if not result:
+            return None
+        row = result[0]
+        return ConversationSummary(
+            session_id=row['SESSION_ID'],
+            summary=row['SUMMARY'],
+            last_message_id=row['LAST_MESSAGE_ID'],
+            turns=row['TURNS'],
+            updated_at=row['UPDATED_AT']
+        )
+
+    def upsert(self, record: ConversationSummary) -> bool:
+        """Store the latest rolling summary of a chat session"""
+        try:
+            query = """
+            MERGE INTO CHAT_SESSION_SUMMARIES t
+            USING (SELECT ? AS session_id, ? AS summary, ? AS last_message_id, ? AS turns) s
+            ON t.session_id = s.session_id
+            WHEN MATCHED THEN UPDATE SET
+                summary = s.summary, last_message_id = s.last_message_id,
+                turns = s.turns, updated_at = CURRENT_TIMESTAMP()
+            WHEN NOT MATCHED THEN INSERT (session_id, summary, last_message_id, turns, updated_at)
+                VALUES (s.session_id, s.summary, s.last_message_id, s.turns, CURRENT_TIMESTAMP())
+            """
+            self.execute_query(query, (record.session_id, record.summary, record.last_message_id, record.turns))
+            return True
+        except Exception as e:
+            self.logger.error(f"Failed to store summary for session {record.session_id}: {str(e)}")
+            return False
+
+    def delete(self, session_id: str) -> bool:
+        """Forget the summary of a deleted chat session"""
+        try:
+            self.execute_query("DELETE FROM CHAT_SESSION_SUMMARIES WHERE session_id = ?", (session_id,))
+            return True
+        except Exception as e:
+            self.logger.error(f"Failed to delete summary for session {session_id}: {str(e)}")
+            return False
@@ -0,0 +1,15 @@
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Dict, Optional
+
+@dataclass
+class ConversationSummary:
+    session_id: str
+    summary: str
+    last_message_id: Optional[str] = None
+    turns: int = 0
+    updated_at: Optional[datetime] = None
+
+    def to_dict(self) -> Dict:
+        """Convert ConversationSummary to dictionary"""
+        return asdict(self)
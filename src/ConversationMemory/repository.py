@@ -0,0 +1,153 @@
+import logging
+import threading
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Set
+
+from snowflake.cortex import Complete
+
+from src.ChatMessage.model import ChatMessage
+from src.ConversationMemory.dao import ConversationSummaryDAO
+from src.ConversationMemory.model import ConversationSummary
+from src.base.connector import get_resource_manager
+
+class ConversationMemory:
+    """
+    Rolling summary of each chat session, persisted in CHAT_SESSION_SUMMARIES.
+    Every update folds only the newest turn into the previous summary, so its cost does not
+    grow with the conversation.
+    """
+    _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="memory")
+
+    def __init__(self, model_name: str = "mistral-large2", max_words: int = 150):
+        """
+        Args:
+            model_name (str): Cortex model that writes the summaries.
+            max_words (int): Length the summary is asked to stay within.
+        """
+        self.connector = get_resource_manager()
+        self.summary_dao = ConversationSummaryDAO()
+        self.model_name = model_name
+        self.max_words = max_words
+        self.logger = logging.getLogger(__name__)
+        self._summaries: Dict[str, Optional[ConversationSummary]] = {}
+        self._pending: Dict[str, Future] = {}
+        self._deleted: Set[str] = set()
+        self._lock = threading.Lock()
+        # Serializes summary writes with `forget`, so a write in flight cannot outlive the delete
+        self._write_lock = threading.Lock()
+
+    def get(self, session_id: str, timeout: float = 10) -> Optional[ConversationSummary]:
+        """Summary of a session, waiting briefly for an update of the previous turn still in flight"""
+        with self._lock:
+            pending = self._pending.get(session_id)
+        if pending is not None:
+            try:
+                pending.result(timeout=timeout)
+            except (Exception, CancelledError) as e:
+                self.logger.warning(f"Using the previous summary of session {session_id}: {str(e)}")
+
+        return self._load(session_id)
+
+    def _load(self, session_id: str) -> Optional[ConversationSummary]:
+        with self._lock:
+            if session_id in self._summaries:
+                return self._summaries[session_id]
+        summary = self.summary_dao.get(session_id)
+        with self._lock:
+            return self._summaries.setdefault(session_id, summary)
+
+    def _prompt(self, previous: Optional[str], turn: List[ChatMessage]) -> str:
+        newest = "\n".join(f"{message.role}: {message.content}" for message in turn)
+        return f"""
+        Update the summary of a conversation with its newest turn.
+        Keep the facts, names, documents and open questions needed to understand follow-up questions.
+        Use at most {self.max_words} words.
+        Answer with only the updated summary.
+        Summary so far: {previous or "(empty)"}
+        Newest turn:
+        {newest}"""
+
+    def update(self, session_id: str, turn: List[ChatMessage]) -> Optional[ConversationSummary]:
+        """Fold one turn (the question and its answer) into the session's summary and persist it"""
+        with self._lock:
+            if session_id in self._deleted:
+                return None
+        previous = self._load(session_id)
+        if not turn:
+            return previous
+        if previous is not None and previous.last_message_id == turn[-1].message_id:
+            return previous
+
+        with self.connector.lease() as session:
+            text = Complete(
+                model=self.model_name,
+                prompt=self._prompt(previous.summary if previous else None, turn),
+                session=session
+            ).strip()
+
+        summary = ConversationSummary(
+            session_id=session_id,
+            summary=text,
+            last_message_id=turn[-1].message_id,
+            turns=(previous.turns if previous else 0) + 1
+        )
+        with self._write_lock:
+            # The session may have been deleted while the summary was being written
+            with self._lock:
+                if session_id in self._deleted:
+                    return None
+            self.summary_dao.upsert(summary)
+            with self._lock:
+                self._summaries[session_id] = summary
+        return summary
+
+    def update_async(self, session_id: str, turn: List[ChatMessage]) -> Future:
+        """Run `update` off the UI thread; the next `get` for the session waits for it"""
+        with self._lock:
+            if session_id in self._deleted:
+                skipped = Future()
+                skipped.set_result(None)
+                return skipped
+            previous = self._pending.get(session_id)
+
+            def run():
+                # Turns of one session are folded in the order they happened
+                if previous is not None:
+                    try:
+                        previous.result()
+                    except (Exception, CancelledError):
+                        pass
+                return self.update(session_id, turn)
+
+            future = self._executor.submit(run)
+            self._pending[session_id] = future
+        future.add_done_callback(lambda done: self._clear_pending(session_id, done))
+        return future
+
+    def _clear_pending(self, session_id: str, future: Future) -> None:
+        if not future.cancelled() and future.exception() is not None:
+            self.logger.error(f"Failed to update summary of session {session_id}: {str(future.exception())}")
+        with self._lock:
+            if self._pending.get(session_id) is future:
+                del self._pending[session_id]
+
+    def forget(self, session_id: str) -> bool:
+        """Drop the summary of a deleted session; updates still queued or running for it never write"""
+        with self._lock:
+            self._deleted.add(session_id)
+            self._summaries.pop(session_id, None)
+            pending = self._pending.pop(session_id, None)
+        if pending is not None:
+            pending.cancel()
+        # Waits for a write that passed its check before the session was marked deleted
+        with self._write_lock:
+            return self.summary_dao.delete(session_id)
+
+# Example usage
+"""
+memory = ConversationMemory()
+memory.update_async("<session_id>", [user_message, assistant_message])
+summary = memory.get("<session_id>")
+rewritten = rag.summarize(chat_history=[assistant_message], query="And the second one?",
+                          conversation_summary=summary.summary)
+"""
@@ -1,37 +1,68 @@
 
 # src/doc_chunks/dao.py
-from typing import List
+from typing import Dict, List, Optional, Sequence, Tuple
 from src.DockChunk.model import ChunkCount, DocChunk
 from src.base.dao import BaseDAO
+from src.base.Chunk.dao import (
+    DOCS_CHUNKS_COLUMNS, DOCS_CHUNKS_TABLE, merge_chunks, neighbor_windows, to_chunk_row
+)
 
 class DocChunksDAO(BaseDAO):
-    def create(self, chunks: List[DocChunk]) -> bool:
-        """Batch insert document chunks"""
+    def __init__(self, batch_size: Optional[int] = None):
+        super().__init__()
+        self.batch_size = batch_size
+
+    def create(self, chunks: List[DocChunk], batch_size: Optional[int] = None, dedupe: bool = False) -> bool:
+        """
+        Batch insert document chunks in a single transaction
+        With `dedupe`, chunks already stored at the same relative_path + chunk_index are updated instead of
+        duplicated (see merge_chunks); chunks without a chunk_index are always inserted.
+        """
         try:
             if not chunks:
                 return True
 
-            query = """
-            INSERT INTO DOCS_CHUNKS_TABLE (
-                relative_path, size, file_url, 
-                scoped_file_url, chunk, category
-            ) VALUES (?, ?, ?, ?, ?, ?)
-            """
-            
-            for chunk in chunks:
-                self.execute_query(query, (
-                    chunk.relative_path,
-                    chunk.size,
-                    chunk.file_url,
-                    chunk.scoped_file_url,
-                    chunk.chunk,
-                    chunk.category
-                ))
+            self.bulk_insert(
+                DOCS_CHUNKS_TABLE,
+                DOCS_CHUNKS_COLUMNS,
+                [to_chunk_row(chunk) for chunk in chunks],
+                batch_size=batch_size or self.batch_size,
+                statement=merge_chunks if dedupe else None,
+            )
             return True
         except Exception as e:
             self.logger.error(f"Failed to create chunks: {str(e)}")
             return False
 
+    def replace_file(self, relative_path: str, chunks: List[DocChunk], batch_size: Optional[int] = None,
+                     then: Sequence[Tuple[str, Sequence]] = ()) -> bool:
+        """
+        Swap all chunks of a document for `chunks` in one transaction; the old chunks stay if it fails
+        `chunks` must be numbered 0..n-1 by chunk_index. They are merged in with dedupe, so unchanged chunks
+        keep their embedding; stored chunks past the new last index, or without one, are deleted.
+        `then` statements (e.g. the manifest update) commit or roll back together with the chunks.
+        """
+        try:
+            self.bulk_insert(
+                DOCS_CHUNKS_TABLE,
+                DOCS_CHUNKS_COLUMNS,
+                [to_chunk_row(chunk) for chunk in chunks],
+                batch_size=batch_size or self.batch_size,
+                delete_first=(
+                    """
+                    DELETE FROM DOCS_CHUNKS_TABLE
+                    WHERE RELATIVE_PATH = ? AND (CHUNK_INDEX IS NULL OR CHUNK_INDEX >= ?)
+                    """,
+                    (relative_path, len(chunks))
+                ),
+                then=then,
+                statement=merge_chunks,
+            )
+            return True
+        except Exception as e:
+            self.logger.error(f"Failed to replace chunks for file {relative_path}: {str(e)}")
+            return False
+
     def get(self, relative_path: str) -> List[DocChunk]:
         """Get all chunks for a document"""
         try:
@@ -46,6 +77,44 @@ class DocChunksDAO(BaseDAO):
             self.logger.error(f"Failed to get chunks: {str(e)}")
             return []
 
+    def get_neighbors(self, relative_path: str, chunk_index: int, radius: int = 1) -> List[DocChunk]:
+        """Chunks of a document within `radius` positions of `chunk_index`, in document order"""
+        try:
+            query = """
+            SELECT * FROM DOCS_CHUNKS_TABLE
+            WHERE relative_path = ? AND chunk_index BETWEEN ? AND ?
+            ORDER BY chunk_index
+            """
+            result = self.execute_query(query, (relative_path, chunk_index - radius, chunk_index + radius))
+            return [DocChunk(**{k.lower(): v for k, v in row.asDict().items()})
+                   for row in result]
+        except Exception as e:
+            self.logger.error(f"Failed to get neighbors: {str(e)}")
+            return []
+
+    def get_neighbors_many(self, anchors: Sequence[Tuple[str, str]],
+                           radius: int = 1) -> Dict[Tuple[str, str], List[DocChunk]]:
+        """
+        Neighbors of many retrieved chunks in one query
+        Args:
+            anchors: (relative_path, content_hash) of each retrieved chunk
+            radius: Chunks to include on each side of an anchor
+        Returns: Chunks around each anchor in document order, keyed by anchor; anchors without a stored chunk are absent
+        """
+        if not anchors:
+            return {}
+        try:
+            query, params = neighbor_windows(list(dict.fromkeys(anchors)), radius)
+            windows: Dict[Tuple[str, str], List[DocChunk]] = {}
+            for row in self.execute_query(query, params):
+                row_dict = {k.lower(): v for k, v in row.asDict().items()}
+                anchor = (row_dict.pop('anchor_path'), row_dict.pop('anchor_hash'))
+                windows.setdefault(anchor, []).append(DocChunk(**row_dict))
+            return windows
+        except Exception as e:
+            self.logger.error(f"Failed to get neighbors: {str(e)}")
+            return {}
+
     def get_file_statistic(self, session_id: str) -> List[ChunkCount]:
         """Get chunk counts for files in a specific session"""
         try:
@@ -1,5 +1,5 @@
 from dataclasses import asdict, dataclass
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
 @dataclass
 class DocChunk:
@@ -9,6 +9,11 @@ class DocChunk:
     scoped_file_url: str
     chunk: str
     category: Optional[str] = None
+    chunk_index: Optional[int] = None
+    start_offset: Optional[int] = None
+    end_offset: Optional[int] = None
+    content_hash: Optional[str] = None
+    embedding: Optional[List[float]] = None
 
 @dataclass
 class ChunkCount:
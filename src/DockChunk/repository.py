@@ -1,9 +1,10 @@
 
 import logging
-import os
 from typing import List, Optional
 from src.DockChunk.dao import DocChunksDAO
 from src.DockChunk.model import DocChunk
+from src.IndexManifest.repository import IncrementalIndexer
+from src.base.lexical import get_lexical_index
 from src.stage.dao import SnowflakeStageDAO
 
 class DocRepository:
@@ -12,42 +13,16 @@ class DocRepository:
         self.chunks_dao = DocChunksDAO()
         self.logger = logging.getLogger(__name__)
 
-    def process_document(self, file_path: str, category: Optional[str] = None) -> bool:
-        """Process document: upload and create chunks"""
+    def process_document(self, file_path: str, dir: str = "", category: Optional[str] = None) -> bool:
+        """Process document: upload it, then parse, chunk and embed it in the warehouse"""
         try:
             # 1. Upload file to stage
-            filename = os.path.basename(file_path)
-            if not self.stage_dao.upload_file(file_path):
+            if not self.stage_dao.upload_file(file_path, dir):
                 return False
 
-            # 2. Get file URLs
-            file_url = self.stage_dao.get_file_url(filename)
-            scoped_url = self.stage_dao.get_file_url(filename, expiration=1800)  # 30 min
-            
-            if not file_url or not scoped_url:
-                return False
-
-            # 3. Get file size
-            file_size = os.path.getsize(file_path)
-
-            # 4. Create chunks (implement your chunking logic here)
-            # chunks = create_chunks_from_file(file_path)
-            chunks = ["Sample chunk 1", "Sample chunk 2"]  # Replace with actual chunking
-
-            # 5. Create DocChunk objects
-            doc_chunks = [
-                DocChunk(
-                    relative_path=filename,
-                    size=file_size,
-                    file_url=file_url,
-                    scoped_file_url=scoped_url,
-                    chunk=chunk,
-                    category=category
-                ) for chunk in chunks
-            ]
-
-            # 6. Save chunks
-            return self.chunks_dao.create_chunks(doc_chunks)
+            # 2. Chunk and embed every file of the directory that is not indexed yet
+            report = IncrementalIndexer(category=category).ingest_directory(dir)
+            return not report.failed
 
         except Exception as e:
             self.logger.error(f"Failed to process document: {str(e)}")
@@ -57,22 +32,12 @@ class DocRepository:
         """Get all chunks for a document"""
         return self.chunks_dao.get_chunks(filename)
 
-    def serch_chunks(self, query: str, category: Optional[str] = None) -> List[DocChunk]:
-        """Search chunks by content and optional category"""
+    def serch_chunks(self, query: str, category: Optional[str] = None, limit: int = 10) -> List[DocChunk]:
+        """Search chunks by content and optional category, ranked by BM25"""
         try:
-            base_query = """
-            SELECT * FROM DOCS_CHUNKS_TABLE
-            WHERE CONTAINS(chunk, %s)
-            """
-            
-            if category:
-                base_query += " AND category = %s"
-                result = self.chunks_dao.execute_query(base_query, (query, category))
-            else:
-                result = self.chunks_dao.execute_query(base_query, (query,))
-
-            return [DocChunk(**{k.lower(): v for k, v in row.asDict().items()})
-                   for row in result]
+            index = get_lexical_index()
+            index.sync_in_background(self.chunks_dao)
+            return [DocChunk(**vars(chunk)) for chunk, _ in index.search(query, limit=limit, category=category)]
         except Exception as e:
             self.logger.error(f"Failed to search chunks: {str(e)}")
-            return []
\ No newline at end of file
+            return []
@@ -0,0 +1,95 @@
+from typing import Dict, List, Optional, Tuple
+from src.IndexManifest.model import ManifestEntry
+from src.base.dao import BaseDAO
+
+class ManifestDAO(BaseDAO):
+
+    def create_table(self):
+        """Create index manifest table if not exists"""
+        query = """
+        CREATE TABLE IF NOT EXISTS DOCS_INDEX_MANIFEST (
+            RELATIVE_PATH VARCHAR(16777216) NOT NULL,
+            MD5 VARCHAR(32) NOT NULL,
+            CHUNK_COUNT NUMBER(38,0) NOT NULL,
+            INDEXED_AT TIMESTAMP_NTZ(9) DEFAULT CURRENT_TIMESTAMP(),
+            PRIMARY KEY (RELATIVE_PATH)
+        )
+        """
+        self.execute_query(query)
+
+    def get_all(self, prefix: Optional[str] = None) -> Dict[str, ManifestEntry]:
+        """Get manifest entries keyed by relative path, optionally under a directory prefix"""
+        query = """
+        SELECT relative_path, md5, chunk_count, indexed_at FROM DOCS_INDEX_MANIFEST
+        """
+        params = None
+        if prefix:
+            query += " WHERE STARTSWITH(relative_path, ?)"
+            params = (prefix.rstrip('/') + '/',)
+        result = self.execute_query(query, params)
+        return {
+            row['RELATIVE_PATH']: ManifestEntry(
+                relative_path=row['RELATIVE_PATH'],
+                md5=row['MD5'],
+                chunk_count=row['CHUNK_COUNT'],
+                indexed_at=row['INDEXED_AT']
+            ) for row in result
+        }
+
+    def get_many(self, relative_paths: List[str]) -> Dict[str, ManifestEntry]:
+        """Get manifest entries of the given files keyed by relative path; unknown files are absent"""
+        if not relative_paths:
+            return {}
+        placeholders = ", ".join("?" for _ in relative_paths)
+        query = f"""
+        SELECT relative_path, md5, chunk_count, indexed_at FROM DOCS_INDEX_MANIFEST
+        WHERE relative_path IN ({placeholders})
+        """
+        result = self.execute_query(query, tuple(relative_paths))
+        return {
+            row['RELATIVE_PATH']: ManifestEntry(
+                relative_path=row['RELATIVE_PATH'],
+                md5=row['MD5'],
+                chunk_count=row['CHUNK_COUNT'],
+                indexed_at=row['INDEXED_AT']
+            ) for row in result
+        }
+
+    @staticmethod
+    def upsert_statement(entry: ManifestEntry) -> Tuple[str, tuple]:
+        """MERGE recording `entry` and its params, for running inside another DAO's transaction"""
+        query = """
+        MERGE INTO DOCS_INDEX_MANIFEST m
+        USING (SELECT ? AS relative_path, ? AS md5, ? AS chunk_count) s
+        ON m.relative_path = s.relative_path
+        WHEN MATCHED THEN UPDATE SET
+            md5 = s.md5, chunk_count = s.chunk_count, indexed_at = CURRENT_TIMESTAMP()
+        WHEN NOT MATCHED THEN INSERT (relative_path, md5, chunk_count, indexed_at)
+            VALUES (s.relative_path, s.md5, s.chunk_count, CURRENT_TIMESTAMP())
+        """
+        return query, (entry.relative_path, entry.md5, entry.chunk_count)
+
+    def upsert(self, entry: ManifestEntry) -> bool:
+        """Record that a file was indexed at the given MD5"""
+        try:
+            self.execute_query(*self.upsert_statement(entry))
+            return True
+        except Exception as e:
+            self.logger.error(f"Failed to update manifest for {entry.relative_path}: {str(e)}")
+            return False
+
+    def delete(self, relative_paths: List[str]) -> bool:
+        """Forget manifest entries for removed files"""
+        if not relative_paths:
+            return True
+        try:
+            placeholders = ", ".join("?" for _ in relative_paths)
+            query = f"""
+            DELETE FROM DOCS_INDEX_MANIFEST
+            WHERE relative_path IN ({placeholders})
+            """
+            self.execute_query(query, tuple(relative_paths))
+            return True
+        except Exception as e:
+            self.logger.error(f"Failed to delete manifest entries: {str(e)}")
+            return False
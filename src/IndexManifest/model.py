@@ -0,0 +1,28 @@
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional
+
+@dataclass
+class ManifestEntry:
+    relative_path: str
+    md5: str
+    chunk_count: int
+    indexed_at: Optional[datetime] = None
+
+@dataclass
+class IndexReport:
+    added: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+    failed: List[str] = field(default_factory=list)
+    chunks_written: int = 0
+
+    @property
+    def skipped(self) -> int:
+        """Files whose stage MD5 matched the manifest and were not re-indexed"""
+        return len(self.unchanged)
+
+    def to_dict(self) -> Dict:
+        """Convert IndexReport to dictionary"""
+        return {**asdict(self), 'skipped': self.skipped}
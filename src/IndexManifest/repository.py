@@ -0,0 +1,251 @@
+import logging
+from typing import Callable, List, Optional, Tuple
+from src.DockChunk.dao import DocChunksDAO
+from src.DockChunk.model import DocChunk
+from src.IndexManifest.dao import ManifestDAO
+from src.IndexManifest.model import IndexReport, ManifestEntry
+from src.stage.dao import SnowflakeStageDAO
+from src.stage.model import StageFile
+
+# (chunk, chunk_index, start_offset, end_offset), as returned by the text_chunker UDTF
+ChunkSpan = Tuple[str, int, Optional[int], Optional[int]]
+
+class IncrementalIndexer:
+    """Re-index only the stage files whose MD5 differs from the manifest"""
+
+    def __init__(self, chunker: Optional[Callable[[str], List[ChunkSpan]]] = None, category: Optional[str] = None):
+        """
+        Args:
+            chunker (Callable, optional): Maps a staged relative path to its chunks with their positions.
+                Defaults to PARSE_DOCUMENT + the text_chunker UDTF in the warehouse.
+            category (str, optional): Category stored on every chunk written.
+        """
+        self.stage_dao = SnowflakeStageDAO()
+        self.chunks_dao = DocChunksDAO()
+        self.manifest_dao = ManifestDAO()
+        self.chunker = chunker or self.parse_and_chunk
+        self.category = category
+        self.logger = logging.getLogger(__name__)
+
+    def parse_and_chunk(self, relative_path: str) -> List[ChunkSpan]:
+        """Parse a staged PDF and split it into chunks in the warehouse, keeping each chunk's position"""
+        query = f"""
+        SELECT c.chunk AS CHUNK, c.chunk_index AS CHUNK_INDEX,
+               c.start_offset AS START_OFFSET, c.end_offset AS END_OFFSET
+        FROM TABLE(text_chunker(TO_VARCHAR(SNOWFLAKE.CORTEX.PARSE_DOCUMENT(
+            @{self.stage_dao.stage_name}, ?, {{'mode': 'LAYOUT'}}
+        ))) OVER ()) c
+        ORDER BY c.chunk_index
+        """
+        result = self.chunks_dao.execute_query(query, (relative_path,))
+        return [(row['CHUNK'], row['CHUNK_INDEX'], row['START_OFFSET'], row['END_OFFSET']) for row in result]
+
+    def index_directory(self, dir: str) -> IndexReport:
+        """
+        Bring DOCS_CHUNKS_TABLE in line with one stage directory:
+        index new and changed files, drop chunks of removed files, skip the rest.
+        Raises: Exception if the directory cannot be listed; nothing is removed then
+        """
+        # A failed LIST must not read as an empty directory, which would remove every indexed file
+        files = self.stage_dao.list_files(dir)
+        manifest = self.manifest_dao.get_all(prefix=dir)
+        report = self.index_files(files, manifest)
+
+        listed = {file.name for file in files}
+        removed = [path for path in manifest if path not in listed]
+        for path in removed:
+            if self.chunks_dao.delete_by_file(path):
+                report.removed.append(path)
+            else:
+                report.failed.append(path)
+        self.manifest_dao.delete(report.removed)
+
+        self.logger.info(
+            f"Indexed {dir}: {len(report.added)} added, {len(report.changed)} changed, "
+            f"{len(report.removed)} removed, {report.skipped} skipped, {len(report.failed)} failed"
+        )
+        return report
+
+    def ingest_directory(self, dir: str, embed_model: str = "e5-base-v2") -> IndexReport:
+        """
+        Parse, chunk and embed every new or changed file of a stage directory entirely in the warehouse:
+        one MERGE over DIRECTORY(@docs), PARSE_DOCUMENT, text_chunker and EMBED_TEXT_768.
+        Removed files are not handled here; use index_directory for a full refresh.
+        """
+        stage = f"@{self.stage_dao.stage_name}"
+        prefix = dir.rstrip('/') + '/' if dir else ''
+        report = IndexReport()
+        # Files PUT since the last refresh are not in DIRECTORY() until the stage is refreshed
+        self.stage_dao.refresh_directory([prefix])
+        with self.chunks_dao.connector.lease() as session:
+            # DDL commits implicitly, so the work list is built before the transaction starts
+            session.sql(
+                f"""
+                CREATE OR REPLACE TEMPORARY TABLE DOCS_INGEST_PENDING AS
+                SELECT d.relative_path, d.size, d.md5, d.file_url, m.relative_path IS NOT NULL AS is_replace
+                FROM DIRECTORY({stage}) d
+                LEFT JOIN DOCS_INDEX_MANIFEST m ON m.relative_path = d.relative_path
+                WHERE STARTSWITH(d.relative_path, ?)
+                  AND (m.relative_path IS NULL OR m.md5 != d.md5)
+                """,
+                params=[prefix]
+            ).collect()
+            pending = session.sql("SELECT relative_path, is_replace FROM DOCS_INGEST_PENDING").collect()
+            if not pending:
+                return report
+            session.sql(
+                f"""
+                CREATE OR REPLACE TEMPORARY TABLE DOCS_INGEST_CHUNKS AS
+                SELECT p.relative_path, p.size, p.file_url, c.chunk, c.chunk_index, c.start_offset, c.end_offset,
+                       SHA2(c.chunk, 256) AS content_hash
+                FROM DOCS_INGEST_PENDING p,
+                     TABLE(text_chunker(TO_VARCHAR(SNOWFLAKE.CORTEX.PARSE_DOCUMENT(
+                         {stage}, p.relative_path, {{'mode': 'LAYOUT'}}
+                     ))) OVER (PARTITION BY p.relative_path)) c
+                """
+            ).collect()
+
+            try:
+                session.sql("BEGIN").collect()
+                # Dedupe on insert: chunks already stored at their position are updated in place,
+                # and only new or changed text is embedded
+                merged = session.sql(
+                    f"""
+                    MERGE INTO DOCS_CHUNKS_TABLE t
+                    USING DOCS_INGEST_CHUNKS s
+                    ON t.relative_path = s.relative_path AND t.chunk_index = s.chunk_index
+                    WHEN MATCHED AND t.content_hash IS DISTINCT FROM s.content_hash THEN UPDATE SET
+                        size = s.size, file_url = s.file_url,
+                        scoped_file_url = BUILD_SCOPED_FILE_URL({stage}, s.relative_path), category = ?,
+                        chunk = s.chunk, start_offset = s.start_offset, end_offset = s.end_offset,
+                        content_hash = s.content_hash, embedding = SNOWFLAKE.CORTEX.EMBED_TEXT_768(?, s.chunk)
+                    WHEN MATCHED THEN UPDATE SET
+                        size = s.size, file_url = s.file_url,
+                        scoped_file_url = BUILD_SCOPED_FILE_URL({stage}, s.relative_path), category = ?,
+                        start_offset = s.start_offset, end_offset = s.end_offset,
+                        embedding = COALESCE(t.embedding, SNOWFLAKE.CORTEX.EMBED_TEXT_768(?, s.chunk))
+                    WHEN NOT MATCHED THEN INSERT
+                        (relative_path, size, file_url, scoped_file_url, chunk, category,
+                         chunk_index, start_offset, end_offset, content_hash, embedding)
+                    VALUES (s.relative_path, s.size, s.file_url, BUILD_SCOPED_FILE_URL({stage}, s.relative_path),
+                            s.chunk, ?, s.chunk_index, s.start_offset, s.end_offset, s.content_hash,
+                            SNOWFLAKE.CORTEX.EMBED_TEXT_768(?, s.chunk))
+                    """,
+                    params=[self.category, embed_model, self.category, embed_model, self.category, embed_model]
+                ).collect()[0].asDict()
+                inserted = merged.get('number of rows inserted', 0) + merged.get('number of rows updated', 0)
+                # Chunks past a file's new end, and rows written before chunks were numbered or the manifest recorded
+                session.sql(
+                    """
+                    DELETE FROM DOCS_CHUNKS_TABLE t
+                    WHERE t.relative_path IN (SELECT relative_path FROM DOCS_INGEST_PENDING)
+                      AND NOT EXISTS (
+                          SELECT 1 FROM DOCS_INGEST_CHUNKS c
+                          WHERE c.relative_path = t.relative_path AND c.chunk_index = t.chunk_index
+                      )
+                    """
+                ).collect()
+                session.sql(
+                    """
+                    MERGE INTO DOCS_INDEX_MANIFEST m
+                    USING (
+                        SELECT p.relative_path, p.md5, COUNT(c.relative_path) AS chunk_count
+                        FROM DOCS_INGEST_PENDING p
+                        LEFT JOIN DOCS_CHUNKS_TABLE c ON c.relative_path = p.relative_path
+                        GROUP BY p.relative_path, p.md5
+                    ) s
+                    ON m.relative_path = s.relative_path
+                    WHEN MATCHED THEN UPDATE SET
+                        md5 = s.md5, chunk_count = s.chunk_count, indexed_at = CURRENT_TIMESTAMP()
+                    WHEN NOT MATCHED THEN INSERT (relative_path, md5, chunk_count, indexed_at)
+                        VALUES (s.relative_path, s.md5, s.chunk_count, CURRENT_TIMESTAMP())
+                    """
+                ).collect()
+                session.sql("COMMIT").collect()
+            except Exception as e:
+                session.sql("ROLLBACK").collect()
+                self.logger.error(f"Failed to ingest {dir}: {str(e)}")
+                report.failed.extend(row['RELATIVE_PATH'] for row in pending)
+                return report
+
+        for row in pending:
+            (report.changed if row['IS_REPLACE'] else report.added).append(row['RELATIVE_PATH'])
+        report.chunks_written = inserted
+        self.logger.info(
+            f"Ingested {dir} in the warehouse: {len(report.added)} added, "
+            f"{len(report.changed)} changed, {report.chunks_written} chunks"
+        )
+        return report
+
+    def index_files(self, files: List[StageFile], manifest: Optional[dict] = None) -> IndexReport:
+        """Index the given stage files unless the manifest already has their MD5"""
+        if manifest is None:
+            manifest = self.manifest_dao.get_many([file.name for file in files])
+
+        report = IndexReport()
+        pending = []
+        for file in files:
+            entry = manifest.get(file.name)
+            if entry is not None and file.md5 and entry.md5 == file.md5:
+                report.unchanged.append(file.name)
+            else:
+                pending.append(file)
+        if not pending:
+            return report
+
+        names = [file.name for file in pending]
+        file_urls = self.stage_dao.get_file_urls(names)
+        scoped_urls = self.stage_dao.get_file_urls(names, expiration=1800)  # 30 min
+        for file in pending:
+            entry = manifest.get(file.name)
+            written = self._index_file(file, file_urls.get(file.name), scoped_urls.get(file.name))
+            if written is None:
+                report.failed.append(file.name)
+                continue
+            (report.changed if entry is not None else report.added).append(file.name)
+            report.chunks_written += written
+        return report
+
+    def _index_file(self, file: StageFile, file_url: Optional[str], scoped_url: Optional[str]) -> Optional[int]:
+        """Chunk one file and swap its chunks in; returns chunks written, or None on failure"""
+        try:
+            chunks = self.chunker(file.name)
+
+            doc_chunks = [
+                DocChunk(
+                    relative_path=file.name,
+                    size=file.size,
+                    file_url=file_url,
+                    scoped_file_url=scoped_url,
+                    chunk=chunk,
+                    category=self.category,
+                    chunk_index=chunk_index,
+                    start_offset=start_offset,
+                    end_offset=end_offset
+                ) for chunk, chunk_index, start_offset, end_offset in chunks
+            ]
+            # Old chunks are dropped and the manifest row written in the same transaction as the new chunks,
+            # so a file is never stored without its manifest row (or twice, for chunks a previous run left behind)
+            manifest_entry = ManifestEntry(
+                relative_path=file.name,
+                md5=file.md5,
+                chunk_count=len(doc_chunks)
+            )
+            if not self.chunks_dao.replace_file(file.name, doc_chunks,
+                                                then=[self.manifest_dao.upsert_statement(manifest_entry)]):
+                return None
+            return len(doc_chunks)
+        except Exception as e:
+            self.logger.error(f"Failed to index {file.name}: {str(e)}")
+            return None
+
+# Example usage
+"""
+# Nightly refresh of one session directory
+indexer = IncrementalIndexer()
+report = indexer.index_directory("<session_id>")
+print(report.to_dict())
+
+# Chunk and embed newly uploaded files without pulling them through the app
+report = indexer.ingest_directory("<session_id>")
+"""
@@ -1,6 +1,7 @@
 from datetime import datetime
 from dataclasses import dataclass
 from typing import Optional
+from src.stage.model import UploadResult
 
 @dataclass
 class RagSource:
@@ -10,13 +11,6 @@ class RagSource:
     relevance_score: float
     created_at: datetime
 
-@dataclass
-class UploadResult:
-    filename: str
-    success: bool
-    error: Optional[str] = None
-    upload_time: datetime = datetime.now()
-
 @dataclass
 class SessionFile:
     session_id: str
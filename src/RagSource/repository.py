@@ -1,20 +1,31 @@
 import logging
 import os
-from typing import List, Dict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import BinaryIO, Callable, List, Dict, Optional, Tuple
 from src.ChatSession.dao import ChatSessionDAO
 from src.DockChunk.dao import DocChunksDAO
 from src.DockChunk.model import ChunkCount
+from src.IndexManifest.model import IndexReport
+from src.IndexManifest.repository import IncrementalIndexer
 from src.RagSource.model import RagSource
+from src.base.lexical import BM25Index
 from src.RagSource.dao import RagSourceDAO, SessionFileDAO
 from src.ChatMessage.dao import ChatMessageDAO
 from src.stage.dao import SnowflakeStageDAO
-from src.stage.model import StageFile
+from src.stage.model import StageFile, UploadResult
 from src.stage.repository import StageRepository
+from src.stage.uploader import StageUploader
 
 class RagSourceRepository:
     """Repository layer for managing RAG sources"""
+    _index_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="index")
     
-    def __init__(self):
+    def __init__(self, lexical_index: Optional[BM25Index] = None):
+        """
+        Args:
+            lexical_index (BM25Index, optional): Synced right after uploads are indexed, so questions never wait for it.
+        """
+        self.lexical_index = lexical_index
         self.rag_source_dao = RagSourceDAO()
         self.chat_message_dao = ChatMessageDAO()
 
@@ -24,20 +35,37 @@ class RagSourceRepository:
         self.chunk_repo = DocChunksDAO()
         self.logger = logging.getLogger(__name__)
 
-    def add_files(self, session_id: str, file_infos: List[str]) -> Dict[str, bool]:
-        """Add multiple files to a session"""
-        results = {}
-        for file_info in file_infos:
-            if not os.path.exists(file_info):
-                self.logger.warning(f"File not found: {file_info}")
-                results[file_info['name']] = False
-                continue
-            if  not self.stage_dao.upload_file(file_info,session_id):
-                results[file_info['name']] = False
-                continue
-            results['name'] = True
-        return results
+    def add_files(self, session_id: str, file_infos: List[str],
+                  on_progress: Optional[Callable[[UploadResult, int, int], None]] = None) -> List[UploadResult]:
+        """Upload multiple files to a session concurrently"""
+        return StageUploader(self.stage_dao).upload_files(file_infos, session_id, on_progress=on_progress)
     
+    def add_streams(self, session_id: str, streams: List[Tuple[str, BinaryIO]],
+                    on_progress: Optional[Callable[[UploadResult, int, int], None]] = None) -> Tuple[List[UploadResult], Future]:
+        """
+        Stream in-memory files to the session's stage directory, then chunk the ones that landed in the background
+        Returns: (one UploadResult per stream, future resolving to the IndexReport of the indexing run)
+        """
+        results = StageUploader(self.stage_dao).upload_streams(streams, session_id, on_progress=on_progress)
+
+        uploaded = {f"{session_id}/{result.filename}" for result in results if result.success}
+        return results, self._index_executor.submit(self.index_uploaded, session_id, uploaded)
+
+    def index_uploaded(self, session_id: str, uploaded: set) -> IndexReport:
+        """
+        Parse, chunk and embed the session's new or changed files in the warehouse, so chunk text never
+        passes through the app and every row gets its EMBEDDING
+        """
+        if not uploaded:
+            return IndexReport()
+        report = IncrementalIndexer().ingest_directory(session_id)
+        if self.lexical_index is not None and (report.added or report.changed):
+            try:
+                self.lexical_index.sync_if_stale(self.chunk_repo, max_age=0)
+            except Exception as e:
+                self.logger.error(f"Failed to sync lexical index after indexing: {str(e)}")
+        return report
+
     def get_files(self,session_id: str) -> List[StageFile]:
         result =  self.stage_dao.get_stage_files(dir=session_id)
         
@@ -1,14 +1,17 @@
-import os
-import tempfile
 import uuid
 import pandas as pd
 import streamlit as st
 
 from src.ChatSession.model import ChatSession
-from src.RagSource.repository import RagSourceRepository
+from src.base.semantic_cache import get_semantic_cache
+from src.base.services import get_rag_source_repository, get_session_services, invalidate_session_services
+
+UPLOAD_SUMMARY_KEY = "upload_summary"
+PENDING_INDEX_KEY = "pending_index"
+
 class RAGFileView:
     def __init__(self, chat_session:ChatSession):
-        self.session_file_repo = RagSourceRepository()
+        self.session_file_repo = get_rag_source_repository()
         self.chat_session:ChatSession   = chat_session
         
 
@@ -17,6 +20,11 @@ class RAGFileView:
         tab1, tab2 = st.tabs(["Upload Files", "Use Web Links"])
         
         with tab1:
+            # Summary of the upload that triggered this rerun
+            for level, message in st.session_state.pop(UPLOAD_SUMMARY_KEY, []):
+                getattr(st, level)(message)
+            self.render_index_status()
+
             with st.form("upload Form", clear_on_submit=True):
                 uploaded_files = st.file_uploader(
                     "Choose PDF files",
@@ -26,24 +34,34 @@ class RAGFileView:
                 )
                 submit = st.form_submit_button("Upload Selected Files", use_container_width=True)
                 if submit:
-                    meta_data = []
-                    with tempfile.NamedTemporaryFile(delete=False) as tmp_file:
-                        temp_dir = os.path.dirname(tmp_file.name)
-                        for uploaded_file in uploaded_files:
-                                temp_path = os.path.join(temp_dir, uploaded_file.name)
-                                
-                                # Write file content
-                                with open(temp_path, 'wb') as f:
-                                    f.write(uploaded_file.getbuffer())
-                                meta_data.append(temp_path)
-                    print(meta_data)
-                    results =  self.session_file_repo.add_files(session_id=self.chat_session.session_id,file_infos=meta_data)
-                    # Show results
-                    # success_count = sum(1 for r in results if r['success'])
-                    # if success_count == len(results):
-                    #     st.success(f"Successfully uploaded all {len(results)} files!")
-                    # else:
-                    #     st.warning(f"Uploaded {success_count} of {len(results)} files successfully.")
+                    progress = st.progress(0.0, text="Uploading...")
+
+                    def on_progress(result, completed, total):
+                        progress.progress(completed / total, text=f"Uploaded {result.filename} ({completed}/{total}, {result.elapsed:.1f}s)")
+
+                    # Uploaded files are already in memory; stream them to the stage without temp copies
+                    with st.spinner("Uploading..."):
+                        results, indexing = self.session_file_repo.add_streams(
+                            session_id=self.chat_session.session_id,
+                            streams=[(uploaded_file.name, uploaded_file) for uploaded_file in uploaded_files],
+                            on_progress=on_progress
+                        )
+                    # Overwritten files invalidate answers cached for any file set containing them
+                    get_semantic_cache().invalidate(
+                        f"{self.chat_session.session_id}/{uploaded_file.name}" for uploaded_file in uploaded_files
+                    )
+                    # The session's file list and retriever are rebuilt on the next rerun
+                    invalidate_session_services(self.chat_session.session_id)
+                    # Kept for the next run, since the rerun below clears this one's output
+                    summary = []
+                    success_count = sum(1 for r in results if r.success)
+                    if success_count == len(results):
+                        summary.append(("success", f"Successfully uploaded all {len(results)} files!"))
+                    else:
+                        summary.append(("warning", f"Uploaded {success_count} of {len(results)} files successfully."))
+                    st.session_state[UPLOAD_SUMMARY_KEY] = summary
+                    # Indexing continues in the background; its outcome is shown once it finishes
+                    st.session_state[PENDING_INDEX_KEY] = (self.chat_session.session_id, indexing)
                     
                     # Clear the uploader
                     st.rerun()
@@ -64,6 +82,30 @@ class RAGFileView:
 
             st.button("Upload and Index", type="primary")
 
+    def render_index_status(self):
+        """Report on the background indexing started by the last upload"""
+        pending = st.session_state.get(PENDING_INDEX_KEY)
+        if pending is None or pending[0] != self.chat_session.session_id:
+            return
+        _, indexing = pending
+        if not indexing.done():
+            st.info("Indexing uploaded files in the background...")
+            return
+
+        del st.session_state[PENDING_INDEX_KEY]
+        try:
+            report = indexing.result()
+        except Exception as e:
+            st.error(f"Failed to index uploaded files: {str(e)}")
+            return
+        # Answers cached before the new chunks were searchable are stale
+        get_semantic_cache().invalidate(report.added + report.changed)
+        invalidate_session_services(self.chat_session.session_id)
+        if report.failed:
+            st.warning(f"Failed to index {len(report.failed)} files: {', '.join(report.failed)}")
+        elif report.added or report.changed:
+            st.success(f"Indexed {len(report.added) + len(report.changed)} files.")
+
     def render_file_list(self):
         """Render file listing with details"""
         # Filter input
@@ -72,7 +114,7 @@ class RAGFileView:
             help="(1) Case-insensitive. (2) Search with empty string to show all files.",
             key="file_filter"
         )
-        chunk_counts = self.session_file_repo.get_files(self.chat_session.session_id)
+        chunk_counts = get_session_services(self.chat_session.session_id).files
         chunk_counts_df = pd.DataFrame([chunk.to_dict() for chunk in chunk_counts])
         if not chunk_counts_df.empty:
             st.dataframe(
@@ -101,6 +143,7 @@ class RAGFileView:
                            type="secondary",
                            help="This will delete all files in the current session"):
                     if self.session_file_repo.remove(self.chat_session.session_id):
+                        invalidate_session_services(self.chat_session.session_id)
                         st.success("All files deleted successfully")
                         st.rerun()
                     else:
@@ -1,38 +1,84 @@
 # src/chunk/dao.py
-from typing import List
+from typing import Dict, List, Optional, Sequence, Tuple
 import logging
 from src.base.Chunk.model import DocumentChunk
 from src.base.dao import BaseDAO
+from src.langchain_snowpoc.cache import text_key
+
+DOCS_CHUNKS_TABLE = "DOCS_CHUNKS_TABLE"
+DOCS_CHUNKS_COLUMNS = (
+    "relative_path", "size", "file_url",
+    "scoped_file_url", "chunk", "category",
+    "chunk_index", "start_offset", "end_offset", "content_hash",
+)
+
+def to_chunk_row(chunk) -> tuple:
+    """Flatten a DocumentChunk/DocChunk into DOCS_CHUNKS_COLUMNS order, hashing its text if needed"""
+    if chunk.content_hash is None:
+        chunk.content_hash = text_key(chunk.chunk)
+    return tuple(getattr(chunk, column) for column in DOCS_CHUNKS_COLUMNS)
+
+def merge_chunks(rows: int) -> str:
+    """
+    MERGE of `rows` chunk rows (DOCS_CHUNKS_COLUMNS order) keyed on relative_path + chunk_index,
+    the dedupe-on-insert mode: a chunk already stored at its position is updated in place instead of
+    inserted again, and keeps its EMBEDDING unless its text changed.
+    """
+    columns = ", ".join(DOCS_CHUNKS_COLUMNS)
+    values = ", ".join("(" + ", ".join("?" for _ in DOCS_CHUNKS_COLUMNS) + ")" for _ in range(rows))
+    metadata = ("size", "file_url", "scoped_file_url", "category", "start_offset", "end_offset")
+    update = ", ".join(f"{column} = s.{column}" for column in metadata)
+    return f"""
+    MERGE INTO DOCS_CHUNKS_TABLE t
+    USING (SELECT * FROM VALUES {values} AS v({columns})) s
+    ON t.relative_path = s.relative_path AND t.chunk_index = s.chunk_index
+    WHEN MATCHED AND t.content_hash IS DISTINCT FROM s.content_hash THEN UPDATE SET
+        {update}, chunk = s.chunk, content_hash = s.content_hash, embedding = NULL
+    WHEN MATCHED THEN UPDATE SET {update}
+    WHEN NOT MATCHED THEN INSERT ({columns})
+        VALUES ({", ".join(f"s.{column}" for column in DOCS_CHUNKS_COLUMNS)})
+    """
+
+def neighbor_windows(anchors: Sequence[Tuple[str, str]], radius: int) -> Tuple[str, list]:
+    """
+    One query for the chunks within `radius` of each (relative_path, content_hash) anchor.
+    Rows carry the anchor they belong to as ANCHOR_PATH/ANCHOR_HASH.
+    """
+    conditions = " OR ".join("(h.relative_path = ? AND h.content_hash = ?)" for _ in anchors)
+    query = f"""
+    SELECT h.relative_path AS ANCHOR_PATH, h.content_hash AS ANCHOR_HASH, n.*
+    FROM DOCS_CHUNKS_TABLE h
+    JOIN DOCS_CHUNKS_TABLE n
+        ON n.relative_path = h.relative_path
+        AND n.chunk_index BETWEEN h.chunk_index - ? AND h.chunk_index + ?
+    WHERE {conditions}
+    ORDER BY n.relative_path, n.chunk_index
+    """
+    return query, [radius, radius] + [value for anchor in anchors for value in anchor]
 
 class ChunkDAO(BaseDAO):
-    def __init__(self):
+    def __init__(self, batch_size: Optional[int] = None):
         super().__init__()
+        self.batch_size = batch_size
         self.logger = logging.getLogger(__name__)
 
-    def create_chunks(self, chunks: List[DocumentChunk]) -> bool:
-        """Batch insert document chunks"""
+    def create_chunks(self, chunks: List[DocumentChunk], batch_size: Optional[int] = None, dedupe: bool = False) -> bool:
+        """
+        Batch insert document chunks in a single transaction
+        With `dedupe`, chunks already stored at the same relative_path + chunk_index are updated instead of
+        duplicated (see merge_chunks); chunks without a chunk_index are always inserted.
+        """
         try:
             if not chunks:
                 return True
 
-            query = """
-            INSERT INTO DOCS_CHUNKS_TABLE (
-                relative_path, size, file_url, 
-                scoped_file_url, chunk, category
-            ) VALUES (%s, %s, %s, %s, %s, %s)
-            """
-            
-            values = [(
-                chunk.relative_path,
-                chunk.size,
-                chunk.file_url,
-                chunk.scoped_file_url,
-                chunk.chunk,
-                chunk.category
-            ) for chunk in chunks]
-            
-            for value in values:
-                self.execute_query(query, value)
+            self.bulk_insert(
+                DOCS_CHUNKS_TABLE,
+                DOCS_CHUNKS_COLUMNS,
+                [to_chunk_row(chunk) for chunk in chunks],
+                batch_size=batch_size or self.batch_size,
+                statement=merge_chunks if dedupe else None,
+            )
             return True
             
         except Exception as e:
@@ -53,6 +99,21 @@ class ChunkDAO(BaseDAO):
             self.logger.error(f"Failed to get chunks: {str(e)}")
             return []
 
+    def get_neighbors(self, relative_path: str, chunk_index: int, radius: int = 1) -> List[DocumentChunk]:
+        """Chunks of a document within `radius` positions of `chunk_index`, in document order"""
+        try:
+            query = """
+            SELECT * FROM DOCS_CHUNKS_TABLE
+            WHERE relative_path = ? AND chunk_index BETWEEN ? AND ?
+            ORDER BY chunk_index
+            """
+            result = self.execute_query(query, (relative_path, chunk_index - radius, chunk_index + radius))
+            return [DocumentChunk(**{k.lower(): v for k, v in row.asDict().items()})
+                   for row in result]
+        except Exception as e:
+            self.logger.error(f"Failed to get neighbors: {str(e)}")
+            return []
+
     def find_by_category(self, category: str) -> List[DocumentChunk]:
         """Find chunks by category"""
         try:
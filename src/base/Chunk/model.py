@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import Optional
+from typing import List, Optional
 
 
 @dataclass
@@ -9,4 +9,9 @@ class DocumentChunk:
     file_url: str
     scoped_file_url: str
     chunk: str
-    category: Optional[str] = None
\ No newline at end of file
+    category: Optional[str] = None
+    chunk_index: Optional[int] = None
+    start_offset: Optional[int] = None
+    end_offset: Optional[int] = None
+    content_hash: Optional[str] = None
+    embedding: Optional[List[float]] = None
\ No newline at end of file
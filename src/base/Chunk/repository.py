@@ -1,43 +1,57 @@
 # src/chunk/repository.py
+import logging
 from typing import List, Dict, Optional
 from src.base.Chunk.dao import ChunkDAO
 from src.base.Chunk.model import DocumentChunk
+from src.base.lexical import get_lexical_index
 from src.stage.repository import StageRepository
 
 class ChunkRepository:
     def __init__(self):
         self.chunk_dao = ChunkDAO()
         self.stage_repo = StageRepository()
+        self.logger = logging.getLogger(__name__)
 
     def create_document_chunks(self, path: str, chunks: List[str], category: Optional[str] = None) -> bool:
         """Create chunks for a document"""
+        return self.create_documents_chunks({path: chunks}, category).get(path, False)
+
+    def create_documents_chunks(self, documents: Dict[str, List[str]], category: Optional[str] = None) -> Dict[str, bool]:
+        """
+        Create chunks for many documents, resolving stage metadata and URLs in batched queries
+        Returns: Dict mapping paths to success status
+        """
         try:
-            # Get file info from stage
-            file_info = self.stage_repo.get_file_info(path)
-            if not file_info:
-                return False
+            paths = list(documents)
+            file_infos = self.stage_repo.get_file_infos(paths)
+            file_urls = self.stage_repo.get_file_urls(paths)
+            scoped_urls = self.stage_repo.get_file_urls(paths, expiration=1800)  # 30 min expiration
+        except Exception as e:
+            self.logger.error(f"Failed to resolve stage files: {str(e)}")
+            return {path: False for path in documents}
 
-            # Get file URL
-            file_url = self.stage_repo.get_file_url(path)
-            scoped_url = self.stage_repo.get_file_url(path, expiration=1800)  # 30 min expiration
+        results = {}
+        for path, chunks in documents.items():
+            file_info = file_infos.get(path)
+            if not file_info:
+                results[path] = False
+                continue
 
-            # Create chunk objects
+            # Create chunk objects, numbered in document order for neighbor expansion
             doc_chunks = [
                 DocumentChunk(
                     relative_path=path,
                     size=file_info.size,
-                    file_url=file_url,
-                    scoped_file_url=scoped_url,
+                    file_url=file_urls.get(path),
+                    scoped_file_url=scoped_urls.get(path),
                     chunk=chunk,
-                    category=category
-                ) for chunk in chunks
+                    category=category,
+                    chunk_index=chunk_index
+                ) for chunk_index, chunk in enumerate(chunks)
             ]
-
-            return self.chunk_dao.create_chunks(doc_chunks)
-            
-        except Exception as e:
-            self.logger.error(f"Failed to create document chunks: {str(e)}")
-            return False
+            # Re-creating a document updates its stored chunks instead of duplicating them
+            results[path] = self.chunk_dao.create_chunks(doc_chunks, dedupe=True)
+        return results
 
     def get_document_chunks(self, path: str) -> List[DocumentChunk]:
         """Get all chunks for a document"""
@@ -57,22 +71,12 @@ class ChunkRepository:
         
         return chunks_deleted
 
-    def search_chunks(self, query: str, category: Optional[str] = None) -> List[DocumentChunk]:
-        """Search through chunks"""
+    def search_chunks(self, query: str, category: Optional[str] = None, limit: int = 10) -> List[DocumentChunk]:
+        """Search through chunks with BM25 over the local lexical index, best match first"""
         try:
-            base_query = """
-            SELECT * FROM DOCS_CHUNKS_TABLE
-            WHERE chunk LIKE %s
-            """
-            
-            params = [f"%{query}%"]
-            if category:
-                base_query += " AND category = %s"
-                params.append(category)
-
-            result = self.chunk_dao.execute_query(base_query, tuple(params))
-            return [DocumentChunk(**{k.lower(): v for k, v in row.asDict().items()})
-                   for row in result]
+            index = get_lexical_index()
+            index.sync_in_background(self.chunk_dao)
+            return [chunk for chunk, _ in index.search(query, limit=limit, category=category)]
                    
         except Exception as e:
             self.logger.error(f"Failed to search chunks: {str(e)}")
@@ -111,7 +115,7 @@ success = chunk_repo.create_document_chunks(
 doc_chunks = chunk_repo.get_document_chunks("docs/example.pdf")
 
 # Search chunks
-results = chunk_repo.search_chunks("specific content", category="Technical")
+results = chunk_repo.search_chunks("specific content", category="Technical", limit=5)
 
 # Get statistics
 stats = chunk_repo.get_document_statistics("docs/example.pdf")
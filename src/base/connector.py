@@ -5,25 +5,41 @@ from typing import Dict, Optional
 from snowflake.snowpark import Session
 from snowflake.core import Root
 from snowflake.snowpark.exceptions import SnowparkSQLException
+from snowflake.connector.errors import (
+    BadGatewayError, GatewayTimeoutError, OperationalError, OtherHTTPRetryableError,
+    RequestTimeoutError, ServiceUnavailableError
+)
+from src.base.pool import SessionPool
+from src.langchain_snowpoc.cache import EmbeddingCache
+from src.langchain_snowpoc.embedding import SnowflakeEmbeddings
 import logging
 
+EMBEDDING_CACHE_PATH = os.environ.get("APP_EMBEDDING_CACHE_PATH", ".cache/embeddings.sqlite")
+
+# Network failures and timeouts worth retrying; auth, permission and SQL errors fail the same way every time
+TRANSIENT_ERRORS = (
+    ConnectionError, TimeoutError, OperationalError, BadGatewayError, GatewayTimeoutError,
+    OtherHTTPRetryableError, RequestTimeoutError, ServiceUnavailableError
+)
+
 
 class SnowflakeConnector:
     """A utility class to manage Snowflake connections with proper error handling"""
     
     _instance = None
 
-    def __init__(self, config: Optional[Dict] = None):
+    def __init__(self, config: Optional[Dict] = None, pool_config: Optional[Dict] = None):
         """
         Initialize the Snowflake connector with either provided config or environment variables
         
         Args:
             config (Dict, optional): Connection parameters dictionary. If None, will use environment variables.
+            pool_config (Dict, optional): Keyword arguments for SessionPool. If None, will use environment variables.
         """
         self.logger = logging.getLogger(__name__)
-        self.session = None
+        self._session = None
         self.config = config or self._get_config_from_env()
-        self.connect()    
+        self.pool = SessionPool(self._create_session, **(pool_config or self._get_pool_config_from_env()))
 
         
     def _get_config_from_env(self) -> Dict:
@@ -41,36 +57,79 @@ class SnowflakeConnector:
         except KeyError as e:
             raise ValueError(f"Required environment variable {str(e)} not set")
 
-    def connect(self) -> Session:
+    def _get_pool_config_from_env(self) -> Dict:
+        """Retrieve session pool settings from environment variables"""
+        return {
+            "min_size": int(os.environ.get("SNOWFLAKE_POOL_MIN_SIZE", 1)),
+            "max_size": int(os.environ.get("SNOWFLAKE_POOL_MAX_SIZE", 4)),
+            "idle_timeout": float(os.environ.get("SNOWFLAKE_POOL_IDLE_TIMEOUT", 300)),
+            "health_check_interval": float(os.environ.get("SNOWFLAKE_POOL_HEALTH_CHECK_INTERVAL", 60)),
+            "acquire_timeout": float(os.environ.get("SNOWFLAKE_POOL_ACQUIRE_TIMEOUT", 30)),
+        }
+
+    def _create_session(self) -> Session:
         """
-        Establish connection to Snowflake
+        Open a new Snowflake session; used by the pool as its session factory
         
-        Returns:
-            Session: Snowflake session object
-            
         Raises:
             SnowparkSQLException: If connection fails
         """
         try:
-            self.session = Session.builder.configs(self.config).create()
-            self.root = Root(self.session)
+            session = Session.builder.configs(self.config).create()
             self.logger.info("Successfully connected to Snowflake")
-            return self.session
+            return session
         except SnowparkSQLException as e:
             self.logger.error(f"Failed to connect to Snowflake: {str(e)}")
             raise
 
+    @property
+    def session(self) -> Session:
+        """
+        Long-lived session for callers that have not moved to `lease()`.
+        It is opened outside the pool so it never takes one of the pool's slots.
+        """
+        if self._session is None:
+            self._session = self._create_session()
+        return self._session
+
+    @property
+    def root(self) -> Root:
+        return Root(self.session)
+
+    def lease(self):
+        """
+        Check out a pooled session for the duration of a `with` block
+        
+        Example:
+            with connector.lease() as session:
+                session.sql("SELECT 1").collect()
+        """
+        return self.pool.lease()
+
+    def connect(self) -> Session:
+        """
+        Ensure the pinned Snowflake session is open
+        
+        Returns:
+            Session: Snowflake session object
+            
+        Raises:
+            SnowparkSQLException: If connection fails
+        """
+        return self.session
+
     def close(self) -> None:
-        """Safely close the Snowflake connection"""
-        if self.session:
+        """Safely close the pinned session and every pooled connection"""
+        if self._session:
             try:
-                self.session.close()
-                self.logger.info("Snowflake connection closed successfully")
+                self._session.close()
             except Exception as e:
-                self.logger.error(f"Error closing Snowflake connection: {str(e)}")
+                self.logger.error(f"Error closing Snowflake session: {str(e)}")
+            self._session = None
+        self.pool.close()
+        self.logger.info("Snowflake connection pool closed successfully")
 
     def complete(self,model:str, prompt:str, question:str, temperature:float):
-        self.connect()
         command = f"""SELECT SNOWFLAKE.CORTEX.COMPLETE(
         '{model}',
         [
@@ -87,22 +146,32 @@ class SnowflakeConnector:
         }}
         )""".strip()
         
-        res = self.session.sql(command).collect()
+        with self.lease() as session:
+            res = session.sql(command).collect()
         answer = json.loads(res[0][0])["choices"][0]["messages"]
-        self.close()
         return str(answer)
-    
+
+
 
 @st.cache_resource()
 def get_resource_manager():
     return SnowflakeConnector()
 
+@st.cache_resource()
+def get_query_embeddings(model: str = "e5-base-v2") -> SnowflakeEmbeddings:
+    """Query embedder shared by the process; repeated questions are served from the on-disk EmbeddingCache"""
+    return SnowflakeEmbeddings(
+        connection=get_resource_manager().session.connection,
+        model=model,
+        cache=EmbeddingCache(EMBEDDING_CACHE_PATH)
+    )
+
 # Example usage:
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
     try:
         connector = SnowflakeConnector()
-        connector.connect()
-        result = connector.session.sql("SELECT current_version()").collect()
+        with connector.lease() as session:
+            result = session.sql("SELECT current_version()").collect()
     except Exception as e:
         print(f"Error: {str(e)}")
\ No newline at end of file
@@ -1,9 +1,12 @@
 import logging
+import os
 from sqlite3 import Row
-from typing import List, Dict
+from typing import Callable, List, Dict, Optional, Sequence, Tuple
 from abc import ABC
 from src.base.connector import  get_resource_manager
 
+DEFAULT_INSERT_BATCH_SIZE = int(os.environ.get("APP_INSERT_BATCH_SIZE", 500))
+
 class BaseDAO(ABC):
     def __init__(self):
         self.connector = get_resource_manager()
@@ -12,11 +15,66 @@ class BaseDAO(ABC):
     def execute_query(self, query: str, params: tuple = None) -> List[Row]:
         """Execute a query and return results"""
         try:
-            if params:
-                result = self.connector.session.sql(query, params=params).collect()
-            else:
-                result = self.connector.session.sql(query,params=params).collect()
-            return result
+            with self.connector.lease() as session:
+                return session.sql(query, params=params).collect()
         except Exception as e:
             print(f"Error executing query: {e}")
-            raise
\ No newline at end of file
+            raise
+
+    def bulk_insert(self, table: str, columns: Sequence[str], rows: Sequence[tuple], batch_size: int = None,
+                    delete_first: Optional[Tuple[str, Sequence]] = None,
+                    then: Sequence[Tuple[str, Sequence]] = (),
+                    statement: Optional[Callable[[int], str]] = None) -> int:
+        """
+        Insert rows as multi-row VALUES statements inside a single transaction
+
+        Args:
+            table (str): Target table name.
+            columns (Sequence[str]): Column names, in the order values appear in each row.
+            rows (Sequence[tuple]): Values to insert, one tuple per row.
+            batch_size (int, optional): Rows per INSERT statement. Defaults to APP_INSERT_BATCH_SIZE.
+            delete_first (Tuple[str, Sequence], optional): DELETE statement and its params, run in the
+                same transaction before the inserts, so the rows it removes are only gone once the new ones are in.
+            then (Sequence[Tuple[str, Sequence]], optional): Statements and their params run after the inserts,
+                before COMMIT, for bookkeeping that must succeed or fail together with the rows.
+            statement (Callable[[int], str], optional): Builds the statement for a batch of n rows, e.g. a MERGE
+                whose params are the batch's values in row order. Defaults to a multi-row INSERT.
+
+        Returns:
+            int: Number of rows inserted (or updated, for a MERGE)
+
+        Raises:
+            Exception: If any batch fails; the whole transaction is rolled back
+        """
+        if not rows and delete_first is None and not then:
+            return 0
+
+        batch_size = batch_size or DEFAULT_INSERT_BATCH_SIZE
+        placeholders = "(" + ", ".join("?" for _ in columns) + ")"
+        inserted = 0
+        with self.connector.lease() as session:
+            session.sql("BEGIN").collect()
+            try:
+                if delete_first is not None:
+                    delete_query, delete_params = delete_first
+                    session.sql(delete_query, params=list(delete_params)).collect()
+                for start in range(0, len(rows), batch_size):
+                    batch = rows[start:start + batch_size]
+                    if statement is not None:
+                        query = statement(len(batch))
+                    else:
+                        query = (
+                            f"INSERT INTO {table} ({', '.join(columns)}) VALUES "
+                            + ", ".join(placeholders for _ in batch)
+                        )
+                    params = [value for row in batch for value in row]
+                    counts = session.sql(query, params=params).collect()[0].asDict()
+                    inserted += counts.get('number of rows inserted', 0) + counts.get('number of rows updated', 0)
+                for then_query, then_params in then:
+                    session.sql(then_query, params=list(then_params)).collect()
+                session.sql("COMMIT").collect()
+            except Exception as e:
+                self.logger.error(f"Bulk insert into {table} failed, rolling back: {str(e)}")
+                session.sql("ROLLBACK").collect()
+                raise
+        return inserted
@@ -0,0 +1,111 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+from src.base.connector import SnowflakeConnector
+from src.base.lexical import LexicalRetriever, get_lexical_index
+from src.base.rag import CortexSearchRetriever, Retriever, SearchHit, SearchResult
+from src.DockChunk.dao import DocChunksDAO
+
+
+def reciprocal_rank_fusion(rankings: List[List[SearchHit]], k: int = 60) -> List[SearchHit]:
+    """
+    Fuse ranked hit lists by summing 1 / (k + rank) per chunk.
+    Chunks are identified by (relative_path, content_hash); the first copy seen is kept.
+    """
+    scores: Dict[Tuple[str, str], float] = {}
+    hits: Dict[Tuple[str, str], SearchHit] = {}
+    for ranking in rankings:
+        for rank, hit in enumerate(ranking, start=1):
+            scores[hit.key] = scores.get(hit.key, 0.0) + 1.0 / (k + rank)
+            hits.setdefault(hit.key, hit)
+
+    fused = sorted(scores, key=scores.get, reverse=True)
+    return [
+        SearchHit(chunk=hits[key].chunk, relative_path=hits[key].relative_path,
+                  score=scores[key], content_hash=hits[key].content_hash)
+        for key in fused
+    ]
+
+
+class HybridRetriever(Retriever):
+    """Dense and lexical retrieval run side by side and fused with reciprocal rank fusion"""
+    _executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="hybrid")
+
+    def __init__(self, dense: Retriever, lexical: Retriever, limit_to_retrieve: int = 4, k: int = 60):
+        """
+        Args:
+            dense (Retriever): Embedding based retriever, e.g. CortexSearchRetriever.
+            lexical (Retriever): Keyword retriever, e.g. LexicalRetriever.
+            limit_to_retrieve (int): Fused hits returned.
+            k (int): RRF damping constant; larger values flatten the contribution of top ranks.
+        """
+        self.dense = dense
+        self.lexical = lexical
+        self._limit_to_retrieve = limit_to_retrieve
+        self.k = k
+        self.logger = logging.getLogger(__name__)
+
+    @property
+    def file_list(self) -> List[str]:
+        return self.dense.file_list
+
+    @file_list.setter
+    def file_list(self, file_list: List[str]) -> None:
+        self.dense.file_list = file_list
+        self.lexical.file_list = file_list
+
+    @staticmethod
+    def _timed(retriever: Retriever, query: str) -> Tuple[SearchResult, float]:
+        start = time.perf_counter()
+        result = retriever.retrieve(query)
+        return result, (time.perf_counter() - start) * 1000
+
+    def retrieve(self, query: str) -> SearchResult:
+        """
+        Fused hits of both sides; if one side fails the other's hits are used alone
+        Raises: RuntimeError if both sides fail
+        """
+        if not self.file_list:
+            return SearchResult([], set())
+
+        start = time.perf_counter()
+        dense = self._executor.submit(self._timed, self.dense, query)
+        lexical = self._executor.submit(self._timed, self.lexical, query)
+
+        timings = {}
+        rankings = []
+        errors = []
+        for name, future in (("dense", dense), ("lexical", lexical)):
+            try:
+                result, elapsed = future.result()
+            except Exception as e:
+                # One failing side degrades to the other instead of failing the question
+                self.logger.error(f"{name} retrieval failed: {str(e)}")
+                errors.append(e)
+                continue
+            timings[name] = elapsed
+            rankings.append(result.hits)
+        if not rankings:
+            # Answering without any context would look like a valid answer
+            raise RuntimeError(f"Dense and lexical retrieval both failed: {errors[0]}; {errors[1]}") from errors[-1]
+
+        fusion_start = time.perf_counter()
+        hits = reciprocal_rank_fusion(rankings, self.k)[:self._limit_to_retrieve]
+        timings["fusion"] = (time.perf_counter() - fusion_start) * 1000
+        timings["total"] = (time.perf_counter() - start) * 1000
+
+        result = SearchResult.from_hits(hits)
+        result.timings = timings
+        return result
+
+
+def load_hybrid_retriever(connector: SnowflakeConnector, file_list: List[str],
+                          limit_to_retrieve: int = 4, fetch_k: int = 20) -> HybridRetriever:
+    """Cortex Search and the local BM25 index, each over-fetching `fetch_k` hits before fusion"""
+    return HybridRetriever(
+        dense=CortexSearchRetriever(connector=connector, file_list=file_list, limit_to_retrieve=fetch_k),
+        lexical=LexicalRetriever(get_lexical_index(), DocChunksDAO(), file_list=file_list, limit_to_retrieve=fetch_k),
+        limit_to_retrieve=limit_to_retrieve
+    )
@@ -0,0 +1,304 @@
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import streamlit as st
+
+from src.base.Chunk.model import DocumentChunk
+from src.base.dao import BaseDAO
+from src.base.rag import Retriever, SearchHit, SearchResult
+from src.langchain_snowpoc.cache import text_key
+
+LEXICAL_SYNC_TTL = float(os.environ.get("APP_LEXICAL_SYNC_TTL", 300))
+
+# SQLite caps the number of host parameters per statement
+_MAX_PARAMS = 500
+
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have in is it its of on or that the this to was were will with
+""".split())
+
+_TOKEN = re.compile(r"\w+")
+
+DOC_COLUMNS = (
+    "relative_path", "size", "file_url", "scoped_file_url", "chunk", "category",
+    "chunk_index", "start_offset", "end_offset", "content_hash",
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased word tokens without stopwords"""
+    return [token for token in _TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    Inverted index over DOCS_CHUNKS_TABLE ranked with Okapi BM25, persisted in SQLite.
+    Every indexed document keeps a fingerprint (chunk count and HASH_AGG of its chunk hashes),
+    so syncing only re-reads the documents whose chunks changed.
+    """
+
+    def __init__(self, path: str = ".cache/lexical.sqlite", k1: float = 1.5, b: float = 0.75):
+        """
+        Args:
+            path (str): SQLite file holding the index.
+            k1 (float): Term frequency saturation.
+            b (float): Strength of document length normalization.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.synced_at: Optional[float] = None
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS docs (
+                    doc_id INTEGER PRIMARY KEY,
+                    {", ".join(DOC_COLUMNS)},
+                    length INTEGER NOT NULL,
+                    UNIQUE (relative_path, content_hash)
+                )
+                """
+            )
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS postings (
+                    term TEXT NOT NULL,
+                    doc_id INTEGER NOT NULL,
+                    tf INTEGER NOT NULL,
+                    PRIMARY KEY (term, doc_id)
+                ) WITHOUT ROWID
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc_id)")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS files (
+                    relative_path TEXT PRIMARY KEY,
+                    chunk_count INTEGER NOT NULL,
+                    signature INTEGER
+                )
+                """
+            )
+
+    def fingerprints(self) -> Dict[str, Tuple[int, Optional[int]]]:
+        """(chunk count, signature) of every indexed document, keyed by relative path"""
+        with self._lock:
+            return {
+                path: (count, signature)
+                for path, count, signature in self._conn.execute(
+                    "SELECT relative_path, chunk_count, signature FROM files"
+                )
+            }
+
+    def add(self, chunks: Iterable[DocumentChunk]) -> int:
+        """Index chunks that are not indexed yet; returns the number added"""
+        added = 0
+        with self._lock, self._conn:
+            for chunk in chunks:
+                if chunk.content_hash is None:
+                    chunk.content_hash = text_key(chunk.chunk)
+                tokens = tokenize(chunk.chunk)
+                cursor = self._conn.execute(
+                    f"INSERT OR IGNORE INTO docs ({', '.join(DOC_COLUMNS)}, length) "
+                    f"VALUES ({', '.join('?' for _ in DOC_COLUMNS)}, ?)",
+                    [getattr(chunk, column) for column in DOC_COLUMNS] + [len(tokens)],
+                )
+                if not cursor.rowcount:
+                    continue
+                self._conn.executemany(
+                    "INSERT INTO postings (term, doc_id, tf) VALUES (?, ?, ?)",
+                    [(term, cursor.lastrowid, tf) for term, tf in Counter(tokens).items()],
+                )
+                added += 1
+        return added
+
+    def remove_files(self, relative_paths: Iterable[str]) -> int:
+        """Drop every chunk of the given documents; returns the number of chunks removed"""
+        removed = 0
+        with self._lock, self._conn:
+            for relative_path in relative_paths:
+                doc_ids = self._conn.execute(
+                    "SELECT doc_id FROM docs WHERE relative_path = ?", (relative_path,)
+                ).fetchall()
+                self._conn.executemany("DELETE FROM postings WHERE doc_id = ?", doc_ids)
+                self._conn.execute("DELETE FROM docs WHERE relative_path = ?", (relative_path,))
+                self._conn.execute("DELETE FROM files WHERE relative_path = ?", (relative_path,))
+                removed += len(doc_ids)
+        return removed
+
+    def _set_fingerprints(self, fingerprints: Dict[str, Tuple[int, Optional[int]]]) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO files (relative_path, chunk_count, signature) VALUES (?, ?, ?)",
+                [(path, count, signature) for path, (count, signature) in fingerprints.items()],
+            )
+
+    def sync(self, dao: BaseDAO, batch_size: int = 100) -> Dict[str, int]:
+        """
+        Bring the index in line with DOCS_CHUNKS_TABLE.
+        One GROUP BY over the raw RELATIVE_PATH/CONTENT_HASH columns fingerprints every document;
+        only documents whose fingerprint changed are fetched, `batch_size` documents per IN query.
+        CONTENT_HASH of older rows is backfilled by sql/chunk_migration.sql.
+        """
+        rows = dao.execute_query(
+            """
+            SELECT relative_path, COUNT(*) AS chunk_count, HASH_AGG(content_hash) AS signature
+            FROM DOCS_CHUNKS_TABLE
+            GROUP BY relative_path
+            """
+        )
+        remote = {row['RELATIVE_PATH']: (row['CHUNK_COUNT'], row['SIGNATURE']) for row in rows}
+        local = self.fingerprints()
+
+        removed = self.remove_files(path for path in local if path not in remote)
+        changed = [path for path, fingerprint in remote.items() if local.get(path) != fingerprint]
+        added = 0
+        for start in range(0, len(changed), batch_size):
+            batch = changed[start:start + batch_size]
+            placeholders = ", ".join("?" for _ in batch)
+            result = dao.execute_query(
+                f"SELECT {', '.join(DOC_COLUMNS)} FROM DOCS_CHUNKS_TABLE WHERE relative_path IN ({placeholders})",
+                tuple(batch),
+            )
+            removed += self.remove_files(batch)
+            added += self.add(
+                DocumentChunk(**{k.lower(): v for k, v in row.asDict().items()}) for row in result
+            )
+            self._set_fingerprints({path: remote[path] for path in batch})
+
+        self.synced_at = time.time()
+        self.logger.info(
+            f"Synced lexical index: {len(changed)} documents re-read, {added} chunks added, {removed} removed"
+        )
+        return {"added": added, "removed": removed}
+
+    def sync_if_stale(self, dao: BaseDAO, max_age: float = LEXICAL_SYNC_TTL) -> None:
+        """Sync unless another caller did so within the last `max_age` seconds"""
+        with self._sync_lock:
+            if self.synced_at is None or time.time() - self.synced_at > max_age:
+                self.sync(dao)
+
+    def sync_in_background(self, dao: BaseDAO, max_age: float = LEXICAL_SYNC_TTL) -> bool:
+        """
+        Start a sync on a background thread if the index is older than `max_age` seconds and no sync is running.
+        Searches keep using the current index meanwhile. An index never synced by this process is synced
+        before returning instead, since searching it would find nothing; a first sync already running is waited for.
+        Returns whether a sync was started.
+        """
+        if self.synced_at is None:
+            self.sync_if_stale(dao, max_age)
+            return True
+        if time.time() - self.synced_at <= max_age:
+            return False
+        if not self._sync_lock.acquire(blocking=False):
+            return False
+
+        def run():
+            try:
+                self.sync(dao)
+            except Exception as e:
+                self.logger.error(f"Failed to sync lexical index: {str(e)}")
+            finally:
+                self._sync_lock.release()
+
+        threading.Thread(target=run, name="lexical-sync", daemon=True).start()
+        return True
+
+    def search(self, query: str, limit: int = 10, category: Optional[str] = None,
+               relative_paths: Optional[Iterable[str]] = None) -> List[Tuple[DocumentChunk, float]]:
+        """Top `limit` chunks by BM25 score, optionally restricted to one category and/or a set of files"""
+        paths = set(relative_paths) if relative_paths is not None else None
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+
+        with self._lock:
+            (count, avg_length) = self._conn.execute("SELECT COUNT(*), AVG(length) FROM docs").fetchone()
+            if not count:
+                return []
+            avg_length = avg_length or 1
+
+            scores: Dict[int, float] = {}
+            for start in range(0, len(terms), _MAX_PARAMS):
+                chunk = terms[start:start + _MAX_PARAMS]
+                placeholders = ", ".join("?" for _ in chunk)
+                frequencies = dict(self._conn.execute(
+                    f"SELECT term, COUNT(*) FROM postings WHERE term IN ({placeholders}) GROUP BY term", chunk
+                ).fetchall())
+                idf = {
+                    term: math.log(1 + (count - df + 0.5) / (df + 0.5))
+                    for term, df in frequencies.items()
+                }
+                category_clause = "AND d.category = ?" if category else ""
+                postings = self._conn.execute(
+                    f"""
+                    SELECT p.term, p.doc_id, p.tf, d.length, d.relative_path
+                    FROM postings p JOIN docs d ON d.doc_id = p.doc_id
+                    WHERE p.term IN ({placeholders}) {category_clause}
+                    """,
+                    chunk + ([category] if category else []),
+                )
+                for term, doc_id, tf, length, relative_path in postings:
+                    if paths is not None and relative_path not in paths:
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * length / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf[term] * tf * (self.k1 + 1) / (tf + norm)
+
+            top = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+            if not top:
+                return []
+            rows = self._conn.execute(
+                f"SELECT doc_id, {', '.join(DOC_COLUMNS)} FROM docs "
+                f"WHERE doc_id IN ({', '.join('?' for _ in top)})",
+                [doc_id for doc_id, _ in top],
+            ).fetchall()
+
+        chunks = {row[0]: DocumentChunk(**dict(zip(DOC_COLUMNS, row[1:]))) for row in rows}
+        return [(chunks[doc_id], score) for doc_id, score in top]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class LexicalRetriever(Retriever):
+    """BM25 counterpart of CortexSearchRetriever over the local lexical index"""
+
+    def __init__(self, index: BM25Index, dao: BaseDAO, file_list: List[str], limit_to_retrieve: int = 4):
+        self.index = index
+        self.dao = dao
+        self.file_list = file_list
+        self._limit_to_retrieve = limit_to_retrieve
+
+    def retrieve(self, query: str) -> SearchResult:
+        if not self.file_list:
+            return SearchResult([], set())
+
+        # Only the first sync is waited for; a stale index is refreshed behind the search
+        self.index.sync_in_background(self.dao)
+        results = self.index.search(query, limit=self._limit_to_retrieve, relative_paths=self.file_list)
+        return SearchResult.from_hits([
+            SearchHit(chunk=chunk.chunk, relative_path=chunk.relative_path, score=score,
+                      content_hash=chunk.content_hash)
+            for chunk, score in results
+        ])
+
+
+@st.cache_resource()
+def get_lexical_index():
+    return BM25Index()
@@ -0,0 +1,191 @@
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from src.base.connector import SnowflakeConnector, get_query_embeddings
+from src.base.rag import Retriever, SearchHit, SearchResult, generate_filter
+
+META_FILE = "meta.json"
+EMBEDDINGS_FILE = "embeddings.npy"
+# Model of the vectors IncrementalIndexer.ingest_directory stores in DOCS_CHUNKS_TABLE.EMBEDDING
+STORED_EMBEDDING_MODEL = "e5-base-v2"
+
+
+def matches_filter(row: Dict[str, str], filters: Dict) -> bool:
+    """
+    Evaluate a Cortex Search style filter (@eq, @or, @and, @not) against one row.
+    Column names are matched case-insensitively, as in Cortex Search.
+    """
+    (operator, operand), = filters.items()
+    if operator == "@eq":
+        (column, value), = operand.items()
+        return row.get(column.lower()) == value
+    if operator == "@or":
+        return any(matches_filter(row, clause) for clause in operand)
+    if operator == "@and":
+        return all(matches_filter(row, clause) for clause in operand)
+    if operator == "@not":
+        return not matches_filter(row, operand)
+    raise ValueError(f"Unsupported filter operator: {operator}")
+
+
+class LocalVectorIndex:
+    """
+    DOCS_CHUNKS_TABLE rows and their embeddings, persisted as a memory-mapped
+    .npy matrix plus a JSON sidecar so loading does not rebuild anything.
+    """
+
+    def __init__(self, directory: str = ".cache/local_index"):
+        self.directory = directory
+        self.logger = logging.getLogger(__name__)
+        self.model: Optional[str] = None
+        self.rows: List[Dict[str, str]] = []
+        self.embeddings: Optional[np.ndarray] = None
+        self._masks: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def exists(self) -> bool:
+        return (os.path.exists(os.path.join(self.directory, META_FILE))
+                and os.path.exists(os.path.join(self.directory, EMBEDDINGS_FILE)))
+
+    def load(self) -> "LocalVectorIndex":
+        """Open a previously built index; embeddings are paged in lazily"""
+        with open(os.path.join(self.directory, META_FILE)) as f:
+            meta = json.load(f)
+        self.model = meta["model"]
+        self.rows = meta["rows"]
+        # Rows deleted while building leave unused zero rows at the end of the matrix
+        self.embeddings = np.load(os.path.join(self.directory, EMBEDDINGS_FILE), mmap_mode="r")[:len(self.rows)]
+        self._masks.clear()
+        return self
+
+    def build(self, connector: SnowflakeConnector, model: str = "e5-base-v2", dimensions: int = 768) -> "LocalVectorIndex":
+        """
+        Write every chunk of DOCS_CHUNKS_TABLE and its embedding to disk.
+        Stored EMBEDDING vectors are reused when they come from the same model; only older rows
+        without one are embedded in the warehouse.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        embedding = "SNOWFLAKE.CORTEX.EMBED_TEXT_768(?, chunk)"
+        if model == STORED_EMBEDDING_MODEL:
+            embedding = f"COALESCE(embedding, {embedding})"
+        with connector.lease() as session:
+            (count,) = session.sql("SELECT COUNT(*) FROM DOCS_CHUNKS_TABLE").collect()[0]
+            embeddings = np.lib.format.open_memmap(
+                os.path.join(self.directory, EMBEDDINGS_FILE),
+                mode="w+", dtype=np.float32, shape=(count, dimensions)
+            )
+            rows = []
+            result = session.sql(
+                f"""
+                SELECT relative_path, category, chunk, {embedding} AS EMBEDDING
+                FROM DOCS_CHUNKS_TABLE
+                """,
+                params=[model]
+            ).to_local_iterator()
+            for idx, row in enumerate(result):
+                if idx >= count:
+                    break
+                embeddings[idx] = row["EMBEDDING"]
+                rows.append({
+                    "relative_path": row["RELATIVE_PATH"],
+                    "category": row["CATEGORY"],
+                    "chunk": row["CHUNK"],
+                })
+            embeddings.flush()
+            del embeddings
+
+        # Normalize once on disk so search is a plain dot product
+        matrix = np.load(os.path.join(self.directory, EMBEDDINGS_FILE), mmap_mode="r+")
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        matrix /= norms
+        matrix.flush()
+        del matrix
+
+        with open(os.path.join(self.directory, META_FILE), "w") as f:
+            json.dump({"model": model, "rows": rows}, f)
+        self.logger.info(f"Built local vector index with {len(rows)} chunks in {self.directory}")
+        return self.load()
+
+    def _mask(self, filters: Optional[Dict]) -> Optional[np.ndarray]:
+        """Boolean row mask for a filter, memoized because file lists repeat across queries"""
+        if not filters:
+            return None
+        key = json.dumps(filters, sort_keys=True)
+        with self._lock:
+            mask = self._masks.get(key)
+            if mask is None:
+                mask = np.fromiter((matches_filter(row, filters) for row in self.rows),
+                                   dtype=bool, count=len(self.rows))
+                self._masks[key] = mask
+                if len(self._masks) > 64:
+                    self._masks.popitem(last=False)
+            else:
+                self._masks.move_to_end(key)
+            return mask
+
+    def search(self, embedding: List[float], limit: int, filters: Optional[Dict] = None) -> List[Dict]:
+        """Top `limit` rows by cosine similarity that satisfy `filters`"""
+        if self.embeddings is None or not self.rows:
+            return []
+
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector = vector / norm
+
+        scores = self.embeddings @ vector
+        mask = self._mask(filters)
+        if mask is not None:
+            scores = np.where(mask, scores, -np.inf)
+
+        limit = min(limit, len(scores))
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+        return [dict(self.rows[idx], score=float(scores[idx])) for idx in top if np.isfinite(scores[idx])]
+
+
+class LocalVectorRetriever(Retriever):
+    """Offline drop-in for CortexSearchRetriever backed by a LocalVectorIndex"""
+
+    def __init__(self, index: LocalVectorIndex, embed_fn: Callable[[str], List[float]],
+                 file_list: List[str], limit_to_retrieve: int = 4):
+        self.index = index
+        self.embed_fn = embed_fn
+        self.file_list = file_list
+        self._limit_to_retrieve = limit_to_retrieve
+
+    def retrieve(self, query: str) -> SearchResult:
+        if not self.file_list:
+            return SearchResult([], set())
+
+        filters = generate_filter("RELATIVE_PATH", self.file_list)
+        results = self.index.search(self.embed_fn(query), self._limit_to_retrieve, filters)
+        if not results:
+            return SearchResult([], set())
+
+        return SearchResult.from_hits([
+            SearchHit(chunk=r["chunk"], relative_path=r["relative_path"], score=r["score"])
+            for r in results
+        ])
+
+
+def load_local_retriever(connector: SnowflakeConnector, file_list: List[str],
+                         directory: str = ".cache/local_index", rebuild: bool = False) -> LocalVectorRetriever:
+    """Open the on-disk index (building it first if missing) and wrap it in a retriever"""
+    index = LocalVectorIndex(directory)
+    if rebuild or not index.exists():
+        index.build(connector)
+    else:
+        index.load()
+    return LocalVectorRetriever(
+        index=index,
+        embed_fn=get_query_embeddings(index.model).embed_query,
+        file_list=file_list
+    )
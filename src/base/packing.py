@@ -0,0 +1,175 @@
+import hashlib
+import logging
+import os
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from src.base.connector import SnowflakeConnector, get_resource_manager
+
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("APP_CONTEXT_TOKEN_BUDGET", 3000))
+# Count context tokens with COUNT_TOKENS (one extra query per answer) instead of character ratios
+CONTEXT_EXACT_TOKENS = os.environ.get("APP_CONTEXT_EXACT_TOKENS", "false").lower() == "true"
+
+# Average characters per token of the tokenizers behind the Cortex models, measured on English prose
+CHARS_PER_TOKEN = {
+    "mistral": 3.6,
+    "mixtral": 3.6,
+    "llama": 4.0,
+    "snowflake-arctic": 4.0,
+    "reka": 4.0,
+    "jamba": 4.0,
+    "gemma": 4.0,
+}
+DEFAULT_CHARS_PER_TOKEN = 3.8
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_WORD = re.compile(r"\w+")
+
+
+def count_tokens(text: str, model: str) -> int:
+    """Approximate token count of `text` for a Cortex model, from its family's characters per token"""
+    ratio = next(
+        (chars for family, chars in CHARS_PER_TOKEN.items() if model.startswith(family)),
+        DEFAULT_CHARS_PER_TOKEN
+    )
+    return int(len(text) / ratio) + 1
+
+
+def count_tokens_cortex(connector: SnowflakeConnector, model: str, texts: Sequence[str]) -> List[int]:
+    """Exact token counts from SNOWFLAKE.CORTEX.COUNT_TOKENS, for every text in one query"""
+    if not texts:
+        return []
+    values = ", ".join("(?, ?)" for _ in texts)
+    query = f"""
+    SELECT v.IDX, SNOWFLAKE.CORTEX.COUNT_TOKENS(?, v.TEXT) AS TOKENS
+    FROM VALUES {values} AS v(IDX, TEXT)
+    ORDER BY v.IDX
+    """
+    params = [model] + [value for idx, text in enumerate(texts) for value in (idx, text)]
+    with connector.lease() as session:
+        return [row['TOKENS'] for row in session.sql(query, params=params).collect()]
+
+
+class MinHasher:
+    """MinHash signatures over word shingles, for estimating Jaccard similarity of chunks"""
+
+    def __init__(self, num_perm: int = 64, shingle_size: int = 5, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        # a, b < 2**32 and shingle hashes < 2**32 keep a * h + b below 2**64
+        self._a = rng.integers(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 32, size=num_perm, dtype=np.uint64)
+        self.shingle_size = shingle_size
+
+    def _shingles(self, text: str) -> np.ndarray:
+        words = _WORD.findall(text.lower())
+        size = min(self.shingle_size, len(words)) or 1
+        shingles = {" ".join(words[i:i + size]) for i in range(max(len(words) - size + 1, 1))}
+        return np.fromiter(
+            (int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=4).digest(), "little")
+             for shingle in shingles),
+            dtype=np.uint64, count=len(shingles)
+        )
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = self._shingles(text)
+        return ((np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME).min(axis=0)
+
+    @staticmethod
+    def similarity(left: np.ndarray, right: np.ndarray) -> float:
+        return float(np.mean(left == right))
+
+
+@dataclass
+class PackedContext:
+    chunks: List[str] = field(default_factory=list)
+    tokens_in: int = 0
+    tokens_used: int = 0
+    duplicates_dropped: int = 0
+    chunks_dropped: int = 0
+    truncated: bool = False
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_in - self.tokens_used
+
+
+class ContextPacker:
+    """Fit retrieved chunks into a token budget: best first, near-duplicates dropped, the last one truncated"""
+
+    def __init__(self, model: str, token_budget: int = CONTEXT_TOKEN_BUDGET,
+                 similarity_threshold: float = 0.8, min_chunk_tokens: int = 50,
+                 hasher: Optional[MinHasher] = None, exact_counts: bool = CONTEXT_EXACT_TOKENS,
+                 connector: Optional[SnowflakeConnector] = None):
+        """
+        Args:
+            model (str): Cortex model the prompt is for; selects the token counting ratio.
+            token_budget (int): Maximum context tokens passed to the model.
+            similarity_threshold (float): Estimated Jaccard similarity above which a chunk counts as a duplicate.
+            min_chunk_tokens (int): Smallest truncated tail worth keeping when a chunk does not fit.
+            hasher (MinHasher, optional): Shared signature generator.
+            exact_counts (bool): Count tokens with SNOWFLAKE.CORTEX.COUNT_TOKENS, all chunks in one query,
+                falling back to the ratios if it fails. Defaults to APP_CONTEXT_EXACT_TOKENS.
+            connector (SnowflakeConnector, optional): Source of sessions for exact counts.
+        """
+        self.model = model
+        self.token_budget = token_budget
+        self.similarity_threshold = similarity_threshold
+        self.min_chunk_tokens = min_chunk_tokens
+        self.hasher = hasher or MinHasher()
+        self.exact_counts = exact_counts
+        self.connector = connector
+        self.logger = logging.getLogger(__name__)
+
+    def _count_tokens(self, chunks: Sequence[str]) -> List[int]:
+        if self.exact_counts and chunks:
+            try:
+                return count_tokens_cortex(self.connector or get_resource_manager(), self.model, chunks)
+            except Exception as e:
+                self.logger.warning(f"COUNT_TOKENS failed, using approximate counts: {str(e)}")
+        return [count_tokens(text, self.model) for text in chunks]
+
+    def pack(self, chunks: Sequence[str], scores: Optional[Sequence[Optional[float]]] = None) -> PackedContext:
+        """
+        Args:
+            chunks: Retrieved chunks, best first unless `scores` says otherwise.
+            scores: Relevance of each chunk; higher is better.
+        """
+        order = list(range(len(chunks)))
+        if scores is not None and all(score is not None for score in scores):
+            # Stable, so equal scores keep retrieval order
+            order.sort(key=lambda idx: scores[idx], reverse=True)
+
+        counts = self._count_tokens(chunks)
+        packed = PackedContext()
+        signatures = []
+        for idx in order:
+            text = chunks[idx]
+            tokens = counts[idx]
+            packed.tokens_in += tokens
+
+            signature = self.hasher.signature(text)
+            if any(self.hasher.similarity(signature, kept) >= self.similarity_threshold for kept in signatures):
+                packed.duplicates_dropped += 1
+                continue
+
+            remaining = self.token_budget - packed.tokens_used
+            if tokens > remaining:
+                if packed.truncated or remaining < self.min_chunk_tokens:
+                    packed.chunks_dropped += 1
+                    continue
+                text = text[:int(len(text) * remaining / tokens)]
+                tokens = remaining
+                packed.truncated = True
+
+            signatures.append(signature)
+            packed.chunks.append(text)
+            packed.tokens_used += tokens
+
+        self.logger.info(
+            f"Packed context: {packed.tokens_used}/{packed.tokens_in} tokens "
+            f"({packed.tokens_saved} saved, {packed.duplicates_dropped} duplicates, {packed.chunks_dropped} dropped)"
+        )
+        return packed
@@ -0,0 +1,205 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List
+
+from snowflake.snowpark import Session
+
+
+@dataclass
+class PooledSession:
+    session: Session
+    created_at: float = field(default_factory=time.monotonic)
+    last_used: float = field(default_factory=time.monotonic)
+    last_checked: float = field(default_factory=time.monotonic)
+
+
+class SessionPool:
+    """A thread-safe pool of reusable Snowpark sessions"""
+
+    def __init__(
+        self,
+        factory: Callable[[], Session],
+        min_size: int = 1,
+        max_size: int = 4,
+        idle_timeout: float = 300,
+        health_check_interval: float = 60,
+        acquire_timeout: float = 30,
+    ):
+        """
+        Initialize the pool and eagerly open `min_size` sessions
+
+        Args:
+            factory (Callable): Creates a new, logged-in Snowpark session.
+            min_size (int): Sessions kept open even when idle.
+            max_size (int): Upper bound on sessions open at the same time.
+            idle_timeout (float): Seconds after which idle sessions above `min_size` are closed.
+            health_check_interval (float): Seconds between `SELECT 1` probes of an idle session.
+            acquire_timeout (float): Seconds to wait for a free session before giving up.
+        """
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(f"Invalid pool size: min_size={min_size}, max_size={max_size}")
+
+        self.logger = logging.getLogger(__name__)
+        self._factory = factory
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.acquire_timeout = acquire_timeout
+
+        self._idle: List[PooledSession] = []
+        self._leased: Dict[int, PooledSession] = {}
+        self._opening = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+        for _ in range(min_size):
+            self._idle.append(PooledSession(self._factory()))
+
+    @property
+    def size(self) -> int:
+        """Number of sessions currently open (idle + leased)"""
+        return len(self._idle) + len(self._leased) + self._opening
+
+    def stats(self) -> Dict[str, int]:
+        """Snapshot of pool usage"""
+        with self._condition:
+            return {
+                "idle": len(self._idle),
+                "leased": len(self._leased),
+                "size": self.size,
+                "max_size": self.max_size,
+            }
+
+    def acquire(self) -> Session:
+        """
+        Check out a healthy session, opening a new one if the pool is not full
+
+        Raises:
+            TimeoutError: If no session becomes available within `acquire_timeout`
+            RuntimeError: If the pool has been closed
+        """
+        deadline = time.monotonic() + self.acquire_timeout
+        while True:
+            with self._condition:
+                while True:
+                    if self._closed:
+                        raise RuntimeError("Session pool is closed")
+                    if self._idle:
+                        pooled = self._idle.pop()
+                        break
+                    if self.size < self.max_size:
+                        self._opening += 1
+                        pooled = None
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(
+                            f"No Snowflake session available after {self.acquire_timeout}s "
+                            f"(max_size={self.max_size})"
+                        )
+                    self._condition.wait(remaining)
+
+            if pooled is None:
+                try:
+                    pooled = PooledSession(self._factory())
+                finally:
+                    with self._condition:
+                        self._opening -= 1
+                        self._condition.notify()
+            elif not self._is_healthy(pooled):
+                self._discard(pooled)
+                self._notify()
+                continue
+
+            pooled.last_used = time.monotonic()
+            with self._condition:
+                self._leased[id(pooled.session)] = pooled
+            return pooled.session
+
+    def release(self, session: Session, discard: bool = False) -> None:
+        """Return a session to the pool, closing it instead if `discard` is set"""
+        with self._condition:
+            pooled = self._leased.pop(id(session), None)
+            if pooled is None:
+                self.logger.warning("Released a session that was not leased from this pool")
+                return
+            if not (discard or self._closed):
+                pooled.last_used = time.monotonic()
+                self._idle.append(pooled)
+                self._condition.notify()
+                pooled = None
+
+        if pooled is not None:
+            self._discard(pooled)
+            self._notify()
+        self.evict_idle()
+
+    @contextmanager
+    def lease(self) -> Iterator[Session]:
+        """Context manager that checks a session out and always checks it back in"""
+        session = self.acquire()
+        broken = False
+        try:
+            yield session
+        except Exception:
+            broken = not self._ping(session)
+            raise
+        finally:
+            self.release(session, discard=broken)
+
+    def evict_idle(self) -> int:
+        """Close sessions that have been idle longer than `idle_timeout`, keeping `min_size` open"""
+        now = time.monotonic()
+        evicted = []
+        with self._condition:
+            # Oldest idle sessions sit at the front of the list
+            self._idle.sort(key=lambda pooled: pooled.last_used)
+            while self._idle and self.size > self.min_size:
+                if now - self._idle[0].last_used < self.idle_timeout:
+                    break
+                evicted.append(self._idle.pop(0))
+
+        for pooled in evicted:
+            self._discard(pooled)
+        if evicted:
+            self._notify()
+        return len(evicted)
+
+    def close(self) -> None:
+        """Close every idle session; leased sessions are closed when released"""
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._condition.notify_all()
+
+        for pooled in idle:
+            self._discard(pooled)
+
+    def _is_healthy(self, pooled: PooledSession) -> bool:
+        if time.monotonic() - pooled.last_checked < self.health_check_interval:
+            return True
+        healthy = self._ping(pooled.session)
+        pooled.last_checked = time.monotonic()
+        return healthy
+
+    def _ping(self, session: Session) -> bool:
+        try:
+            session.sql("SELECT 1").collect()
+            return True
+        except Exception as e:
+            self.logger.warning(f"Snowflake session failed health check: {str(e)}")
+            return False
+
+    def _notify(self) -> None:
+        with self._condition:
+            self._condition.notify()
+
+    def _discard(self, pooled: PooledSession) -> None:
+        try:
+            pooled.session.close()
+        except Exception as e:
+            self.logger.error(f"Error closing Snowflake session: {str(e)}")
@@ -1,14 +1,98 @@
-from dataclasses import dataclass
-from typing import List, Optional
+import re
+import threading
+from abc import ABC, abstractmethod
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
 from snowflake.cortex import Complete
 from trulens.apps.custom import instrument
 from snowflake.core import Root
-from src.base.connector import SnowflakeConnector, get_resource_manager
+from snowflake.snowpark import Session
+from src.base.connector import SnowflakeConnector, get_query_embeddings, get_resource_manager
+from src.base.packing import ContextPacker, PackedContext
+from src.base.semantic_cache import CachedAnswer, SemanticCache
+from src.DockChunk.dao import DocChunksDAO
+from src.DockChunk.model import DocChunk
+from src.langchain_snowpoc.cache import text_key
+
+@dataclass
+class SearchHit:
+   chunk: str
+   relative_path: str
+   score: Optional[float] = None
+   content_hash: Optional[str] = None
+
+   def __post_init__(self):
+      if self.content_hash is None:
+         self.content_hash = text_key(self.chunk)
+
+   @property
+   def key(self) -> Tuple[str, str]:
+      return (self.relative_path, self.content_hash)
 
 @dataclass 
 class SearchResult:
    context_text: List[str]
    relative_paths: set[str]
+   hits: List[SearchHit] = field(default_factory=list)
+   # Milliseconds spent in each retrieval stage, when the retriever reports them
+   timings: Dict[str, float] = field(default_factory=dict)
+
+   @classmethod
+   def from_hits(cls, hits: List[SearchHit]) -> "SearchResult":
+      return cls(
+         context_text=[hit.chunk for hit in hits],
+         relative_paths=set(hit.relative_path for hit in hits),
+         hits=hits
+      )
+
+   def merge(self, other: "SearchResult") -> "SearchResult":
+      """Union of both results, this one's hits first, keeping the first occurrence of each chunk"""
+      hits: Dict[Tuple[str, str], SearchHit] = {}
+      for hit in self.hits + other.hits:
+         hits.setdefault(hit.key, hit)
+      return SearchResult(
+         context_text=list(dict.fromkeys(self.context_text + other.context_text)),
+         relative_paths=self.relative_paths | other.relative_paths,
+         hits=list(hits.values()),
+         timings={**other.timings, **self.timings}
+      )
+
+def _overlap(previous: DocChunk, chunk: DocChunk) -> int:
+   """
+   Characters `chunk` repeats from the end of `previous`, going by their offsets.
+   0 when the offsets are missing or inconsistent, or the texts do not actually match.
+   """
+   if previous.end_offset is None or chunk.start_offset is None:
+      return 0
+   if not 0 <= chunk.start_offset <= previous.end_offset:
+      return 0
+   overlap = previous.end_offset - chunk.start_offset
+   if overlap > min(len(previous.chunk), len(chunk.chunk)):
+      return 0
+   if overlap and chunk.chunk[:overlap] != previous.chunk[-overlap:]:
+      return 0
+   return overlap
+
+def stitch(chunks: List[DocChunk]) -> str:
+   """Join consecutive chunks of one document into a single passage, dropping their overlap"""
+   text = chunks[0].chunk
+   for previous, chunk in zip(chunks, chunks[1:]):
+      overlap = _overlap(previous, chunk)
+      if overlap or (chunk.start_offset is not None and chunk.start_offset == previous.end_offset):
+         text += chunk.chunk[overlap:]
+      else:
+         text += "\n" + chunk.chunk
+   return text
+
+def query_overlap(left: str, right: str) -> float:
+   """Jaccard similarity of the lower-cased word sets of two queries"""
+   left_words = set(re.findall(r"\w+", left.lower()))
+   right_words = set(re.findall(r"\w+", right.lower()))
+   if not left_words and not right_words:
+      return 1.0
+   return len(left_words & right_words) / len(left_words | right_words)
 
 # generation_prompt = PromptTemplate(
 #     input_variables=["query", "context"],
@@ -25,53 +109,93 @@ def generate_filter(column_name: str, array: list[str]):
             for element in array
         ]
     }
-class CortexSearchRetriever:
+class Retriever(ABC):
+    """Anything that turns a query into chunks from the session's files"""
+    file_list: List[str]
+
+    @abstractmethod
+    def retrieve(self, query: str) -> SearchResult:
+        ...
+
+class CortexSearchRetriever(Retriever):
     def __init__(self, connector: SnowflakeConnector, file_list:List[str],limit_to_retrieve: int = 4):
-        self._session = connector.session
+        self._connector = connector
         self._limit_to_retrieve = limit_to_retrieve
         self.COLUMNS                = ["chunk","relative_path","category"]
         self.CORTEX_SEARCH_DATABASE = "cortex_search_db"
         self.CORTEX_SEARCH_SCHEMA   = "DATA"
         self.CORTEX_SEARCH_SERVICE  = "CC_SEARCH_SERVICE_CS"
         self.file_list = file_list
+        self._services = weakref.WeakKeyDictionary()
+        self._services_lock = threading.Lock()
 
+    def _service(self, session: Session):
+        """Search service handle for a pooled session, built once per session"""
+        with self._services_lock:
+            service = self._services.get(session)
+            if service is None:
+                service = (Root(session)
+                         .databases[self.CORTEX_SEARCH_DATABASE]
+                         .schemas[self.CORTEX_SEARCH_SCHEMA]
+                         .cortex_search_services[self.CORTEX_SEARCH_SERVICE])
+                self._services[session] = service
+            return service
 
     def retrieve(self, query: str)-> SearchResult:
-        service = (Root(self._session)
-                 .databases[self.CORTEX_SEARCH_DATABASE]
-                 .schemas[self.CORTEX_SEARCH_SCHEMA]
-                 .cortex_search_services[self.CORTEX_SEARCH_SERVICE])
-        
-
         if not self.file_list:
             return SearchResult([], set())
         
         filters = generate_filter("RELATIVE_PATH", self.file_list)
-        print(filters)
-        resp = service.search(
-           query=query,
-           columns=self.COLUMNS,
-           limit=self._limit_to_retrieve,
-           filter=filters
-       )
+        with self._connector.lease() as session:
+            resp = self._service(session).search(
+               query=query,
+               columns=self.COLUMNS,
+               limit=self._limit_to_retrieve,
+               filter=filters
+           )
         if not resp.results:
            return SearchResult([], set())
 
-        return SearchResult(
-           context_text=[r["chunk"] for r in resp.results],
-           relative_paths=set(r['relative_path'] for r in resp.results)
-       )
+        return SearchResult.from_hits([
+           SearchHit(chunk=r["chunk"], relative_path=r["relative_path"])
+           for r in resp.results
+        ])
 
 class RAG_from_scratch:
-    def __init__(self,model_name:str = "mistral-large2",file_list:List[str]=[]):
+    _executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="rag")
+
+    def __init__(self,model_name:str = "mistral-large2",file_list:List[str]=[],pipelined:bool = True,
+                 semantic_cache: Optional[SemanticCache] = None, retriever: Optional[Retriever] = None,
+                 neighbor_radius: int = 0, packer: Optional[ContextPacker] = None,
+                 reuse_threshold: float = 0.8):
+        """
+        Args:
+            model_name (str): Cortex model used for summarization and answers.
+            file_list (List[str]): Stage paths the retriever is restricted to.
+            pipelined (bool): Retrieve on the raw query while the chat history is being summarized.
+            reuse_threshold (float): Word overlap between the raw and rewritten query above which
+                the pipelined hits are used as they are; below it they are merged with a retrieval for the rewrite.
+            semantic_cache (SemanticCache, optional): Answers reused for near-identical queries over the same files.
+            retriever (Retriever, optional): Replaces the default CortexSearchRetriever, e.g. a LocalVectorRetriever.
+            neighbor_radius (int): Chunks on each side of a hit added to the context (small-to-big); 0 disables.
+            packer (ContextPacker, optional): Token budget and dedupe for the context; defaults to APP_CONTEXT_TOKEN_BUDGET.
+        """
         self.connector    =   get_resource_manager()
+        self.embeddings   =   get_query_embeddings()
+        self.pipelined    =   pipelined
+        self.reuse_threshold = reuse_threshold
+        self.semantic_cache = semantic_cache
+        self.neighbor_radius = neighbor_radius
+        self.chunks_dao = DocChunksDAO() if neighbor_radius else None
 
-        self.retriever = CortexSearchRetriever(
+        self.retriever = retriever or CortexSearchRetriever(
             connector=self.connector,
             limit_to_retrieve=4,
             file_list=file_list
         )
         self.model_name =   model_name
+        self.packer     =   packer or ContextPacker(model=model_name)
+        self.last_packing: Optional[PackedContext] = None
         
     @instrument
     def retrieve_context(self, query: str) -> SearchResult:
@@ -81,9 +205,9 @@ class RAG_from_scratch:
         return self.retriever.retrieve(query)
 
 
-    @instrument
-    def generate_completion(self, query: str, context: List[str]) -> str:
-       prompt = f"""
+    def _completion_prompt(self, query: str, context: List[str]) -> str:
+       context = "\n\n---\n\n".join(context)
+       return f"""
        You are an expert assistant extracting information from context provided.
        Answer the question based on the context.
        Be concise and do not hallucinate.
@@ -96,43 +220,220 @@ class RAG_from_scratch:
        Query: {query}
        Answer:"""
 
-       return Complete(
-           model=self.model_name,
-           prompt=prompt,
-           session=self.connector.session
-       )
-    
     @instrument
-    def summarize(self, chat_history: List[str], query: str) -> str:
+    def generate_completion(self, query: str, context: List[str]) -> str:
+       prompt = self._completion_prompt(query, context)
+
+       with self.connector.lease() as session:
+           return Complete(
+               model=self.model_name,
+               prompt=prompt,
+               session=session
+           )
+
+    @instrument
+    def generate_completion_stream(self, query: str, context: List[str]) -> Iterator[str]:
+       """
+       Yield the answer token by token as Cortex produces it.
+       The pooled session is only leased until the first token arrives; the rest is read from the
+       REST response, so a stream abandoned by an interrupted rerun does not hold a pool slot.
+       """
+       prompt = self._completion_prompt(query, context)
+
+       with self.connector.lease() as session:
+           response = iter(Complete(
+               model=self.model_name,
+               prompt=prompt,
+               session=session,
+               stream=True
+           ))
+           first = next(response, None)
+
+       try:
+           if first is not None:
+               yield first
+               yield from response
+       finally:
+           close = getattr(response, "close", None)
+           if close is not None:
+               close()
+
+    @instrument
+    def summarize(self, chat_history: List[str], query: str, conversation_summary: Optional[str] = None) -> str:
+        """
+        Rewrite a follow-up question as a standalone query.
+        With a `conversation_summary`, `chat_history` only needs the last turn, so the prompt stays the same size.
+        """
+        summary = f"""
+        Conversation summary: {conversation_summary}""" if conversation_summary else ""
         prompt = f"""
         Based on the chat history below and the query, generate a query that extends the query with the chat history provided.
         The query should be in natural language. 
         Answer with only the query.
-        Do not add any explanation.
+        Do not add any explanation.{summary}
         Chat history: {chat_history}
         Query: {query}"""
 
-        return Complete(
-            model=self.model_name,
-            prompt=prompt,
-            session=self.connector.session
+        with self.connector.lease() as session:
+            return Complete(
+                model=self.model_name,
+                prompt=prompt,
+                session=session
+            )
+
+    def _rewrite(self, query: str, history_chat: Optional[List[str]],
+                 conversation_summary: Optional[str] = None) -> tuple[str, Optional[Future]]:
+        """
+        Rewrite a follow-up question with the chat history.
+        In pipelined mode, retrieval on the raw query is started speculatively
+        and runs while the LLM rewrites it; `_retrieve` decides whether its hits are used.
+        """
+        if not history_chat and not conversation_summary:
+            return query, None
+        if not self.pipelined:
+            return self.summarize(history_chat, query, conversation_summary), None
+
+        speculative = self._executor.submit(self.retrieve_context, query)
+        return self.summarize(history_chat, query, conversation_summary), speculative
+
+    def _retrieve(self, query: str, original: str, speculative: Optional[Future]) -> SearchResult:
+        """
+        Retrieve for the rewritten query.
+        When the rewrite barely changed the query, the speculative hits are used and retrieval
+        overlapped the rewrite entirely; otherwise retrieval runs once more for the rewritten query
+        and the speculative hits are merged in behind its own, de-duplicated, so their search is not wasted.
+        """
+        if speculative is not None and query_overlap(query, original) >= self.reuse_threshold:
+            return self._expand(speculative.result())
+        result = self.retrieve_context(query=query)
+        if speculative is not None:
+            try:
+                result = result.merge(speculative.result())
+            except Exception:
+                # The rewritten query's hits are a complete answer on their own
+                pass
+        return self._expand(result)
+
+    def _expand(self, result: SearchResult) -> SearchResult:
+        """
+        Replace each hit with the passage formed by it and its stored neighbors,
+        fetched for all hits in one query. Overlapping windows in a document are merged.
+        """
+        if not self.neighbor_radius or not result.hits:
+            return result
+
+        windows = self.chunks_dao.get_neighbors_many([hit.key for hit in result.hits], self.neighbor_radius)
+        if not windows:
+            return result
+
+        # Chunks of each document reachable from any hit, with the best rank of a hit that reached them
+        reached: Dict[str, Dict[int, Tuple[int, DocChunk]]] = {}
+        passages: List[Tuple[int, str]] = []
+        for rank, hit in enumerate(result.hits):
+            window = windows.get(hit.key)
+            if not window:
+                passages.append((rank, hit.chunk))
+                continue
+            document = reached.setdefault(hit.relative_path, {})
+            for chunk in window:
+                best, _ = document.get(chunk.chunk_index, (rank, chunk))
+                document[chunk.chunk_index] = (min(best, rank), chunk)
+
+        for document in reached.values():
+            run: List[DocChunk] = []
+            run_rank = None
+            for index in sorted(document):
+                rank, chunk = document[index]
+                if run and index != run[-1].chunk_index + 1:
+                    passages.append((run_rank, stitch(run)))
+                    run, run_rank = [], None
+                run.append(chunk)
+                run_rank = rank if run_rank is None else min(run_rank, rank)
+            passages.append((run_rank, stitch(run)))
+
+        passages.sort(key=lambda passage: passage[0])
+        return SearchResult(
+            context_text=[text for _, text in passages],
+            relative_paths=result.relative_paths,
+            hits=result.hits,
+            timings=result.timings
         )
 
+    def _pack(self, result: SearchResult) -> List[str]:
+        """Context chunks that fit the token budget, best first and without near-duplicates"""
+        scores = None
+        if [hit.chunk for hit in result.hits] == result.context_text:
+            scores = [hit.score for hit in result.hits]
+        self.last_packing = self.packer.pack(result.context_text, scores)
+        return self.last_packing.chunks
+
+    def _lookup_answer(self, query: str, speculative: Optional[Future] = None) -> tuple[Optional[CachedAnswer], Optional[List[float]]]:
+        """
+        Cached answer for the query, if any. The query is only embedded when the file set has cached answers;
+        otherwise `_store_answer` embeds it after the answer has been generated.
+        On a hit, the speculative retrieval is cancelled if it has not started and its result is ignored.
+        """
+        if self.semantic_cache is None or not self.semantic_cache.has_entries(self.retriever.file_list):
+            return None, None
+        embedding = self.embeddings.embed_query(query)
+        cached = self.semantic_cache.lookup(embedding, self.retriever.file_list)
+        if cached is not None and speculative is not None:
+            speculative.cancel()
+        return cached, embedding
+
+    def _store_answer(self, query: str, embedding: Optional[List[float]], answer: str, relative_paths: set) -> None:
+        if self.semantic_cache is None:
+            return
+        if embedding is None:
+            embedding = self.embeddings.embed_query(query)
+        self.semantic_cache.store(query, embedding, answer, relative_paths, self.retriever.file_list)
+
     @instrument
     def query(
         self, 
         query: str, 
         history_chat: Optional[List[str]] = None,
+        conversation_summary: Optional[str] = None,
     ) -> tuple[str, set]:
-        if history_chat:
-            query = self.summarize(history_chat, query)
-            
-        result = self.retrieve_context(
-            query=query
-        )
-        
-        response = self.generate_completion(query, result.context_text)
+        rewritten, speculative = self._rewrite(query, history_chat, conversation_summary)
+
+        cached, embedding = self._lookup_answer(rewritten, speculative)
+        if cached is not None:
+            return cached.answer, cached.relative_paths
+
+        result = self._retrieve(rewritten, query, speculative)
+        response = self.generate_completion(rewritten, self._pack(result))
+        self._store_answer(rewritten, embedding, response, result.relative_paths)
         return response, result.relative_paths
+
+    @instrument
+    def query_stream(
+        self, 
+        query: str, 
+        history_chat: Optional[List[str]] = None,
+        conversation_summary: Optional[str] = None,
+    ) -> tuple[Iterator[str], set]:
+        """
+        Like `query`, but return the answer as a token generator.
+        Summarization and retrieval run before this returns; generation starts on first iteration.
+        """
+        rewritten, speculative = self._rewrite(query, history_chat, conversation_summary)
+
+        cached, embedding = self._lookup_answer(rewritten, speculative)
+        if cached is not None:
+            return iter([cached.answer]), cached.relative_paths
+
+        result = self._retrieve(rewritten, query, speculative)
+        context = self._pack(result)
+
+        def stream() -> Iterator[str]:
+            tokens = []
+            for token in self.generate_completion_stream(rewritten, context):
+                tokens.append(token)
+                yield token
+            self._store_answer(rewritten, embedding, "".join(tokens), result.relative_paths)
+
+        return stream(), result.relative_paths
 # def create_prompt (question:str,use_chat_history:bool):
 
 #     if use_chat_history:
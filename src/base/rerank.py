@@ -0,0 +1,214 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import streamlit as st
+from snowflake.cortex import Complete
+
+from src.base.connector import SnowflakeConnector
+from src.base.hybrid import load_hybrid_retriever
+from src.base.rag import Retriever, SearchHit, SearchResult
+from src.langchain_snowpoc.cache import text_key
+
+# cross-encoder | cortex | none
+RERANKER = os.environ.get("APP_RERANKER", "none")
+
+
+class Reranker(ABC):
+    """Scores how well each candidate chunk answers a query; higher is better"""
+    name: str
+
+    @abstractmethod
+    def score(self, query: str, chunks: Sequence[str]) -> List[float]:
+        ...
+
+
+class CrossEncoderReranker(Reranker):
+    """Local sentence-transformers cross-encoder, scoring all candidates in one CPU batch"""
+
+    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2", batch_size: int = 64):
+        # Imported here so the app does not load torch unless this reranker is used
+        from sentence_transformers import CrossEncoder
+
+        self.name = model_name
+        self.batch_size = batch_size
+        self._model = CrossEncoder(model_name, device="cpu")
+
+    def score(self, query: str, chunks: Sequence[str]) -> List[float]:
+        scores = self._model.predict([(query, chunk) for chunk in chunks], batch_size=self.batch_size)
+        return [float(score) for score in scores]
+
+
+class CortexReranker(Reranker):
+    """Scores every candidate with a single Cortex COMPLETE call"""
+
+    def __init__(self, connector: SnowflakeConnector, model_name: str = "mistral-large2", max_chars: int = 600):
+        """
+        Args:
+            connector (SnowflakeConnector): Source of pooled sessions.
+            model_name (str): Cortex model asked for the scores.
+            max_chars (int): Characters of each candidate shown to the model, to bound the prompt size.
+        """
+        self.connector = connector
+        self.name = f"cortex:{model_name}"
+        self.model_name = model_name
+        self.max_chars = max_chars
+        self.logger = logging.getLogger(__name__)
+
+    def _prompt(self, query: str, chunks: Sequence[str]) -> str:
+        passages = "\n".join(
+            f"[{idx}] {chunk[:self.max_chars]}" for idx, chunk in enumerate(chunks)
+        )
+        return f"""
+        Rate how relevant each numbered passage is to the query on a scale from 0 (unrelated) to 10 (answers it).
+        Answer with only a JSON array of {len(chunks)} numbers, one per passage, in passage order.
+        Query: {query}
+        Passages:
+        {passages}"""
+
+    def score(self, query: str, chunks: Sequence[str]) -> List[float]:
+        with self.connector.lease() as session:
+            response = Complete(model=self.model_name, prompt=self._prompt(query, chunks), session=session)
+
+        match = re.search(r"\[.*?\]", response, re.DOTALL)
+        scores = [float(score) for score in json.loads(match.group(0))] if match else []
+        if len(scores) != len(chunks):
+            # Raised rather than padded so partial answers are never cached as scores
+            raise ValueError(f"Expected {len(chunks)} rerank scores, got {len(scores)}")
+        return scores
+
+
+class RerankScoreCache:
+    """LRU of rerank scores keyed by (reranker, query hash, chunk hash)"""
+
+    def __init__(self, max_entries: int = 50_000):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._scores: "OrderedDict[Tuple[str, str, str], float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, reranker: str, query: str, hits: Sequence[SearchHit]) -> Dict[int, float]:
+        """Mapping of position in `hits` to its cached score, for hits only"""
+        query_hash = text_key(query)
+        found = {}
+        with self._lock:
+            for idx, hit in enumerate(hits):
+                key = (reranker, query_hash, hit.content_hash)
+                if key in self._scores:
+                    self._scores.move_to_end(key)
+                    found[idx] = self._scores[key]
+            self.hits += len(found)
+            self.misses += len(hits) - len(found)
+        return found
+
+    def put_many(self, reranker: str, query: str, scored: Sequence[Tuple[SearchHit, float]]) -> None:
+        query_hash = text_key(query)
+        with self._lock:
+            for hit, score in scored:
+                self._scores[(reranker, query_hash, hit.content_hash)] = score
+            while len(self._scores) > self.max_entries:
+                self._scores.popitem(last=False)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._scores),
+            }
+
+
+class RerankingRetriever(Retriever):
+    """Over-fetch candidates from another retriever and keep the `top_k` the reranker scores best"""
+
+    def __init__(self, candidates: Retriever, reranker: Reranker, top_k: int = 4,
+                 cache: Optional[RerankScoreCache] = None):
+        """
+        Args:
+            candidates (Retriever): Retriever configured to return many candidates, e.g. 50.
+            reranker (Reranker): Scores the candidates in one batch.
+            top_k (int): Hits passed on to generation.
+            cache (RerankScoreCache, optional): Scores reused for repeated (query, chunk) pairs.
+        """
+        self.candidates = candidates
+        self.reranker = reranker
+        self.top_k = top_k
+        self.cache = cache
+        self.logger = logging.getLogger(__name__)
+
+    @property
+    def file_list(self) -> List[str]:
+        return self.candidates.file_list
+
+    @file_list.setter
+    def file_list(self, file_list: List[str]) -> None:
+        self.candidates.file_list = file_list
+
+    def retrieve(self, query: str) -> SearchResult:
+        result = self.candidates.retrieve(query)
+        hits = result.hits
+        if len(hits) <= 1:
+            return result
+
+        start = time.perf_counter()
+        scores = self.cache.get_many(self.reranker.name, query, hits) if self.cache else {}
+        missing = [idx for idx in range(len(hits)) if idx not in scores]
+        if missing:
+            try:
+                fresh = self.reranker.score(query, [hits[idx].chunk for idx in missing])
+            except Exception as e:
+                self.logger.error(f"Reranking failed, keeping retrieval order: {str(e)}")
+                fresh = [-float(idx) for idx in missing]
+            else:
+                if self.cache:
+                    self.cache.put_many(self.reranker.name, query, [(hits[idx], score) for idx, score in zip(missing, fresh)])
+            scores.update(zip(missing, fresh))
+
+        # sorted() is stable, so ties keep the retriever's order
+        ranked = sorted(range(len(hits)), key=lambda idx: scores[idx], reverse=True)[:self.top_k]
+        reranked = SearchResult.from_hits([
+            SearchHit(chunk=hits[idx].chunk, relative_path=hits[idx].relative_path,
+                      score=scores[idx], content_hash=hits[idx].content_hash)
+            for idx in ranked
+        ])
+        reranked.timings = {**result.timings, "rerank": (time.perf_counter() - start) * 1000}
+        return reranked
+
+
+_score_cache = RerankScoreCache()
+
+
+@st.cache_resource()
+def get_reranker(_connector: SnowflakeConnector, kind: str = RERANKER) -> Optional[Reranker]:
+    """Reranker selected by APP_RERANKER, or None when reranking is off; loaded once per process"""
+    if kind == "cross-encoder":
+        return CrossEncoderReranker()
+    if kind == "cortex":
+        return CortexReranker(_connector)
+    return None
+
+
+def load_reranking_retriever(connector: SnowflakeConnector, file_list: List[str], top_k: int = 4,
+                             fetch_k: int = 50, reranker: Optional[Reranker] = None) -> Retriever:
+    """
+    Hybrid retrieval of `fetch_k` candidates reranked down to `top_k`.
+    Without a reranker (APP_RERANKER=none) this is plain hybrid retrieval of `top_k` hits.
+    """
+    reranker = reranker or get_reranker(connector)
+    if reranker is None:
+        return load_hybrid_retriever(connector, file_list, limit_to_retrieve=top_k)
+    return RerankingRetriever(
+        candidates=load_hybrid_retriever(connector, file_list, limit_to_retrieve=fetch_k, fetch_k=fetch_k),
+        reranker=reranker,
+        top_k=top_k,
+        cache=_score_cache
+    )
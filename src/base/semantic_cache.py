@@ -0,0 +1,126 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import streamlit as st
+
+
+@dataclass
+class CachedAnswer:
+    query: str
+    embedding: np.ndarray
+    answer: str
+    relative_paths: set[str]
+    created_at: float = field(default_factory=time.time)
+
+
+class SemanticCache:
+    """Answers to previous queries, looked up by embedding similarity within the same file set"""
+
+    def __init__(self, threshold: float = 0.92, ttl: float = 3600, max_entries_per_scope: int = 256):
+        """
+        Args:
+            threshold (float): Minimum cosine similarity for a cached query to count as a hit.
+            ttl (float): Seconds an answer stays valid.
+            max_entries_per_scope (int): Answers kept per file set; oldest are dropped first.
+        """
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries_per_scope = max_entries_per_scope
+        self.hits = 0
+        self.misses = 0
+        self._scopes: Dict[Tuple[str, ...], List[CachedAnswer]] = {}
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def _scope(file_list: Iterable[str]) -> Tuple[str, ...]:
+        return tuple(sorted(set(file_list)))
+
+    @staticmethod
+    def _normalize(embedding: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def has_entries(self, file_list: Iterable[str]) -> bool:
+        """Whether any answer is cached for the file set, so callers can skip embedding the query"""
+        with self._lock:
+            return bool(self._scopes.get(self._scope(file_list)))
+
+    def lookup(self, embedding: Sequence[float], file_list: Iterable[str]) -> Optional[CachedAnswer]:
+        """
+        Return the most similar unexpired answer for the same file set, if above the threshold.
+        The answer is a copy, so callers may change its `relative_paths`.
+        """
+        vector = self._normalize(embedding)
+        now = time.time()
+        with self._lock:
+            entries = self._scopes.get(self._scope(file_list), [])
+            entries[:] = [entry for entry in entries if now - entry.created_at < self.ttl]
+
+            best = None
+            if entries:
+                similarities = np.stack([entry.embedding for entry in entries]) @ vector
+                idx = int(np.argmax(similarities))
+                if similarities[idx] >= self.threshold:
+                    best = entries[idx]
+
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return replace(best, relative_paths=set(best.relative_paths))
+
+    def store(self, query: str, embedding: Sequence[float], answer: str,
+              relative_paths: set[str], file_list: Iterable[str]) -> None:
+        """Remember an answer for later lookups against the same file set"""
+        entry = CachedAnswer(
+            query=query,
+            embedding=self._normalize(embedding),
+            answer=answer,
+            relative_paths=set(relative_paths),
+        )
+        with self._lock:
+            entries = self._scopes.setdefault(self._scope(file_list), [])
+            entries.append(entry)
+            del entries[:-self.max_entries_per_scope]
+
+    def invalidate(self, file_list: Optional[Iterable[str]] = None) -> int:
+        """
+        Drop cached answers for every file set containing any of the given files.
+        With no files, clear the whole cache.
+
+        Returns:
+            int: Number of answers dropped
+        """
+        with self._lock:
+            if file_list is None:
+                dropped = sum(len(entries) for entries in self._scopes.values())
+                self._scopes.clear()
+                return dropped
+
+            changed = set(file_list)
+            stale = [scope for scope in self._scopes if changed.intersection(scope)]
+            dropped = sum(len(self._scopes.pop(scope)) for scope in stale)
+            self.logger.info(f"Invalidated {dropped} cached answers for {len(changed)} changed files")
+            return dropped
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters and number of cached answers"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": sum(len(entries) for entries in self._scopes.values()),
+            }
+
+
+@st.cache_resource()
+def get_semantic_cache():
+    return SemanticCache()
@@ -0,0 +1,96 @@
+import atexit
+import logging
+from typing import List, Optional
+
+import streamlit as st
+
+from src.ChatMessage.history import ChatHistoryManager
+from src.ChatMessage.writer import MessageWriteQueue
+from src.ChatSession.repository import ChatRepository
+from src.ConversationMemory.repository import ConversationMemory
+from src.RagSource.repository import RagSourceRepository
+from src.base.connector import get_resource_manager
+from src.base.lexical import get_lexical_index
+from src.base.rag import RAG_from_scratch
+from src.base.rerank import load_reranking_retriever
+from src.base.semantic_cache import get_semantic_cache
+from src.stage.dao import SnowflakeStageDAO
+from src.stage.model import StageFile
+
+SESSION_SERVICES_KEY = "session_services"
+HISTORY_PAGE_SIZE = 20
+
+logger = logging.getLogger(__name__)
+
+
+@st.cache_resource()
+def get_message_writer() -> MessageWriteQueue:
+    """Process-wide write-behind queue for chat messages, flushed when the server exits"""
+    writer = MessageWriteQueue()
+    atexit.register(writer.close)
+    return writer
+
+
+@st.cache_resource()
+def get_conversation_memory() -> ConversationMemory:
+    return ConversationMemory()
+
+
+@st.cache_resource()
+def get_chat_repository() -> ChatRepository:
+    return ChatRepository(writer=get_message_writer())
+
+
+@st.cache_resource()
+def get_rag_source_repository() -> RagSourceRepository:
+    return RagSourceRepository(lexical_index=get_lexical_index())
+
+
+@st.cache_resource()
+def get_stage_dao() -> SnowflakeStageDAO:
+    return SnowflakeStageDAO()
+
+
+class SessionServices:
+    """Everything a chat session's views need, loaded once and reused across reruns"""
+
+    def __init__(self, session_id: str, slide_window: int = 7):
+        """
+        Args:
+            session_id (str): Chat session the services belong to.
+            slide_window (int): Most recent messages given to the model as chat history.
+        """
+        self.session_id = session_id
+        self.slide_window = slide_window
+        self.files: List[StageFile] = get_rag_source_repository().get_files(session_id)
+        self.chat_history = ChatHistoryManager(
+            data=get_chat_repository().getMessage(session_id, limit=HISTORY_PAGE_SIZE),
+            slide_window=slide_window,
+            page_size=HISTORY_PAGE_SIZE
+        )
+
+        file_names = [file.name for file in self.files]
+        self.rag_service = RAG_from_scratch(file_list=file_names,
+                                            semantic_cache=get_semantic_cache(),
+                                            retriever=load_reranking_retriever(get_resource_manager(), file_names),
+                                            neighbor_radius=1)
+
+
+def get_session_services(session_id: str, slide_window: int = 7) -> SessionServices:
+    """
+    Services of the open chat session, kept in st.session_state.
+    Opening a different session replaces them, so only one session's state is held per browser tab.
+    """
+    services: Optional[SessionServices] = st.session_state.get(SESSION_SERVICES_KEY)
+    if services is None or services.session_id != session_id:
+        services = SessionServices(session_id, slide_window)
+        st.session_state[SESSION_SERVICES_KEY] = services
+        logger.info(f"Loaded services for session {session_id}")
+    return services
+
+
+def invalidate_session_services(session_id: Optional[str] = None) -> None:
+    """Drop the cached services (only if they belong to `session_id`, when given) so the next rerun reloads them"""
+    services: Optional[SessionServices] = st.session_state.get(SESSION_SERVICES_KEY)
+    if services is not None and (session_id is None or services.session_id == session_id):
+        del st.session_state[SESSION_SERVICES_KEY]
@@ -11,7 +11,8 @@ class StageManager:
 
     def create_stage(self) -> bool:
         try:
-            self.connector.session.sql(f"""
+            with self.connector.lease() as session:
+                session.sql(f"""
                 CREATE OR REPLACE STAGE {self.stage_name}
                 ENCRYPTION = (TYPE = 'SNOWFLAKE_SSE')
                 DIRECTORY = (
@@ -20,7 +21,7 @@ class StageManager:
                     AUTO_REFRESH = true
                 )
                 COMMENT = 'Secure stage for storing and processing PDF documents'
-            """).collect()
+                """).collect()
             return True
         except Exception as e:
             self.logger.error(f"Stage creation failed: {str(e)}")
@@ -28,8 +29,8 @@ class StageManager:
 
     def upload_file(self, file_path:str,session_id:str) -> bool:
         try:
-            self.connector.session.sql(f"""
-    def upload_file(self, file_path:str,session_id:str) -> bool:
+            with self.connector.lease() as session:
+                session.sql(f"""
                 PUT file://{file_path} @{self.stage_name}/{session_id}
                 AUTO_COMPRESS = FALSE
                 OVERWRITE = TRUE
@@ -41,7 +42,8 @@ class StageManager:
 
     def list_files(self,dir) -> list:
         try:
-            return self.connector.session.sql(f"LIST @{self.stage_name}/{dir}").collect()
+            with self.connector.lease() as session:
+                return session.sql(f"LIST @{self.stage_name}/{dir}").collect()
         except Exception as e:
             self.logger.error(f"Listing files failed: {str(e)}")
             return []
@@ -52,11 +54,12 @@ class StageManager:
         Returns True if the stage exists, False otherwise.
         """
         try:
-            result = self.connector.session.sql(f"""
+            with self.connector.lease() as session:
+                result = session.sql(f"""
                 SELECT COUNT(*) as count 
                 FROM INFORMATION_SCHEMA.STAGES 
                 WHERE STAGE_NAME = '{self.stage_name}'
-            """).collect()
+                """).collect()
             
             return result[0]['COUNT'] > 0
         except Exception as e:
@@ -0,0 +1,157 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# SQLite caps the number of host parameters per statement
+_MAX_PARAMS = 500
+
+
+def text_key(text: str) -> str:
+    """Content address of a text: the hex sha256 of its UTF-8 bytes."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """On-disk, content-addressed cache of embedding vectors.
+
+    Vectors are stored as float32 blobs keyed by (model, sha256(text)) in a
+    SQLite file. When more than `max_entries` vectors are stored, the least
+    recently used ones are evicted.
+
+    Example:
+        .. code-block:: python
+
+            from langchain_snowpoc.cache import EmbeddingCache
+            from langchain_snowpoc.embedding import SnowflakeEmbeddings
+            sf_emb = SnowflakeEmbeddings(
+                connection=conn,
+                cache=EmbeddingCache(".cache/embeddings.sqlite"),
+            )
+
+    """
+
+    def __init__(self, path: str = ".cache/embeddings.sqlite", max_entries: int = 200_000):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    model TEXT NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    last_access REAL NOT NULL,
+                    PRIMARY KEY (model, text_hash)
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings (last_access)"
+            )
+
+    def get_many(self, model: str, texts: Sequence[str]) -> Dict[int, np.ndarray]:
+        """Look up cached vectors.
+
+        Args:
+            model: The embedding model the vectors were produced with.
+            texts: The texts to look up.
+
+        Returns:
+            Mapping of position in `texts` to its cached vector, for hits only.
+        """
+        keys = [text_key(text) for text in texts]
+        found: Dict[str, np.ndarray] = {}
+        unique_keys = list(dict.fromkeys(keys))
+        with self._lock:
+            for start in range(0, len(unique_keys), _MAX_PARAMS):
+                chunk = unique_keys[start:start + _MAX_PARAMS]
+                placeholders = ", ".join("?" for _ in chunk)
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *chunk],
+                ).fetchall()
+                for text_hash, vector in rows:
+                    found[text_hash] = np.frombuffer(vector, dtype=np.float32)
+            if found:
+                now = time.time()
+                with self._conn:
+                    self._conn.executemany(
+                        "UPDATE embeddings SET last_access = ? WHERE model = ? AND text_hash = ?",
+                        [(now, model, text_hash) for text_hash in found],
+                    )
+
+            result = {idx: found[key] for idx, key in enumerate(keys) if key in found}
+            self.hits += len(result)
+            self.misses += len(keys) - len(result)
+        return result
+
+    def put_many(self, model: str, items: Sequence[Tuple[str, Sequence[float]]]) -> None:
+        """Store vectors and evict least recently used entries above the cap.
+
+        Args:
+            model: The embedding model the vectors were produced with.
+            items: (text, vector) pairs.
+        """
+        if not items:
+            return
+        now = time.time()
+        rows = [
+            (model, text_key(text), np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for text, vector in items
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_access) "
+                "VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+            overflow = count - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE rowid IN ("
+                    "SELECT rowid FROM embeddings ORDER BY last_access LIMIT ?)",
+                    (overflow,),
+                )
+                logger.debug(f"Evicted {overflow} embeddings from {self.path}")
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters and current size."""
+        with self._lock:
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": entries,
+            }
+
+    def clear(self) -> None:
+        """Remove every cached vector and reset the counters."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM embeddings")
+            self.hits = 0
+            self.misses = 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
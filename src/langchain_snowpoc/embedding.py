@@ -1,11 +1,15 @@
 import logging
-from typing import Any, List, Mapping, Optional
+from typing import Any, Iterator, List, Mapping, Optional, Tuple
+
+import numpy as np
 
 from langchain_core.embeddings import Embeddings
 from langchain_core.pydantic_v1 import BaseModel
 from snowflake.connector import DictCursor
 from snowflake.connector.connection import SnowflakeConnection
 
+from src.langchain_snowpoc.cache import EmbeddingCache
+
 logger = logging.getLogger(__name__)
 
 
@@ -43,6 +47,18 @@ class SnowflakeEmbeddings(BaseModel, Embeddings):
     model_kwargs: Optional[dict] = None
     """Other model keyword args"""
 
+    dimensions: int = 768
+    """Size of the vectors returned by EMBED_TEXT_768"""
+
+    max_batch_size: int = 256
+    """Maximum number of texts embedded by a single query"""
+
+    max_batch_bytes: int = 512_000
+    """Maximum UTF-8 size of the texts embedded by a single query"""
+
+    cache: Optional[EmbeddingCache] = None
+    """Content-addressed vector cache consulted before calling Cortex"""
+
     class Config:
         """Configuration for this pydantic object."""
 
@@ -56,35 +72,88 @@ class SnowflakeEmbeddings(BaseModel, Embeddings):
             **self._default_params,
         }
 
-    def _process_emb_response(self, input: str) -> List[float]:
-        """Process a response from Snowflake.
+    def _iter_batches(
+        self, input: List[Tuple[int, str]]
+    ) -> Iterator[List[Tuple[int, str]]]:
+        """Group texts into batches bounded by count and UTF-8 byte size.
 
         Args:
-            response: The response from Snowflake.
+            input: (position, text) pairs to embed.
 
-        Returns:
-            The response as a dictionary.
+        Yields:
+            Lists of (position, text) pairs.
         """
-        to_embed = input.replace("'", "\\'")
-        q = f"SELECT SNOWFLAKE.CORTEX.EMBED_TEXT_768('{self.model}', '{to_embed}') as EMBEDDING"
+        batch: List[Tuple[int, str]] = []
+        batch_bytes = 0
+        for idx, text in input:
+            text_bytes = len(text.encode("utf-8"))
+            if batch and (
+                len(batch) >= self.max_batch_size
+                or batch_bytes + text_bytes > self.max_batch_bytes
+            ):
+                yield batch
+                batch, batch_bytes = [], 0
+            batch.append((idx, text))
+            batch_bytes += text_bytes
+        if batch:
+            yield batch
+
+    def _embed_batch(self, batch: List[Tuple[int, str]]) -> List[Tuple[int, List[float]]]:
+        """Embed a batch of texts with a single set-based query.
 
-        return self.connection.cursor(DictCursor).execute(q).fetchone()["EMBEDDING"]
+        Args:
+            batch: (position, text) pairs to embed.
 
-    def _embed(self, input: List[str]) -> List[List[float]]:
+        Returns:
+            (position, embedding) pairs.
+        """
+        values = ", ".join("(%s, %s)" for _ in batch)
+        q = (
+            "SELECT v.IDX, SNOWFLAKE.CORTEX.EMBED_TEXT_768(%s, v.TEXT) AS EMBEDDING "
+            f"FROM VALUES {values} AS v(IDX, TEXT) ORDER BY v.IDX"
+        )
+        params = [self.model] + [value for pair in batch for value in pair]
+        rows = self.connection.cursor(DictCursor).execute(q, params).fetchall()
+        return [(row["IDX"], row["EMBEDDING"]) for row in rows]
+
+    def _iter_embeddings(self, input: List[str]) -> Iterator[Tuple[int, Any]]:
+        pending = list(enumerate(input))
+        if self.cache is not None:
+            cached = self.cache.get_many(self.model, input)
+            yield from cached.items()
+            pending = [(idx, text) for idx, text in pending if idx not in cached]
+
+        progress = None
         if self.show_progress:
             try:
                 from tqdm import tqdm
 
-                iter_ = tqdm(input, desc="SnowflakeEmbeddings")
+                progress = tqdm(total=len(pending), desc="SnowflakeEmbeddings")
             except ImportError:
                 logger.warning(
                     "Unable to show progress bar because tqdm could not be imported. "
                     "Please install with `pip install tqdm`."
                 )
-                iter_ = input
-        else:
-            iter_ = input
-        return [self._process_emb_response(prompt) for prompt in iter_]
+        for batch in self._iter_batches(pending):
+            embedded = self._embed_batch(batch)
+            if self.cache is not None:
+                texts = dict(batch)
+                self.cache.put_many(
+                    self.model, [(texts[idx], embedding) for idx, embedding in embedded]
+                )
+            yield from embedded
+            if progress is not None:
+                progress.update(len(batch))
+        if progress is not None:
+            progress.close()
+
+    def _embed(self, input: List[str]) -> List[List[float]]:
+        embeddings: List[Optional[List[float]]] = [None] * len(input)
+        for idx, embedding in self._iter_embeddings(input):
+            if isinstance(embedding, np.ndarray):
+                embedding = embedding.tolist()
+            embeddings[idx] = embedding
+        return embeddings
 
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
         """Embed documents using Snowflake's embedding model.
@@ -99,6 +168,24 @@ class SnowflakeEmbeddings(BaseModel, Embeddings):
         embeddings = self._embed(instruction_pairs)
         return embeddings
 
+    def embed_documents_array(self, texts: List[str]) -> np.ndarray:
+        """Embed documents into a contiguous float32 matrix.
+
+        Args:
+            texts: The list of texts to embed.
+
+        Returns:
+            Array of shape (len(texts), dimensions), one row per text.
+        """
+        embeddings = np.empty((len(texts), self.dimensions), dtype=np.float32)
+        for idx, embedding in self._iter_embeddings(texts):
+            embeddings[idx] = embedding
+        return embeddings
+
+    def cache_stats(self) -> Mapping[str, float]:
+        """Hit/miss counters of the embedding cache, empty when no cache is set."""
+        return self.cache.stats() if self.cache is not None else {}
+
     def embed_query(self, text: str) -> List[float]:
         """Embed a query using Snowfake embedding model.
 
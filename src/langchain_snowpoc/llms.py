@@ -1,22 +1,136 @@
+import asyncio
 import logging
-from typing import Any, List, Mapping, Optional
-
-from langchain_core.callbacks.manager import CallbackManagerForLLMRun
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Coroutine, Iterator, List, Mapping, Optional, Sequence
+
+from langchain_core.callbacks.manager import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
 from langchain_core.language_models.llms import LLM
 from langchain_core.messages import AIMessage
+from langchain_core.outputs import Generation, LLMResult
+from pydantic import PrivateAttr
 from snowflake import snowpark
 from snowflake.connector import DictCursor
 from snowflake.connector.connection import SnowflakeConnection
 from snowflake.cortex import Complete
 
+from src.base.pool import SessionPool
+
 logger = logging.getLogger(__name__)
 
+_COMPLETE_QUERY = (
+    "SELECT SNOWFLAKE.CORTEX.COMPLETE(%(model)s, %(prompt)s) as COMPLETION"
+)
+
+
+def _limit_concurrency(
+    coroutines: Sequence[Coroutine], concurrency: int
+) -> List[Coroutine]:
+    """Wrap coroutines so that at most `concurrency` of them run at once."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def with_concurrency_limit(coroutine: Coroutine) -> Any:
+        async with semaphore:
+            return await coroutine
+
+    return [with_concurrency_limit(coroutine) for coroutine in coroutines]
+
+
+def _enforce_stop(text: str, stop: Optional[List[str]]) -> str:
+    """Cut the completion at the first stop sequence; COMPLETE has no stop option."""
+    if not stop:
+        return text
+    cut = min((idx for idx in (text.find(word) for word in stop) if idx != -1), default=len(text))
+    return text[:cut]
+
+
+class _CortexBase(LLM):
+    """COMPLETE calls run concurrently for `batch()`/`abatch()`.
+
+    Every prompt goes through the subclass's `_call`, whether it is sent alone
+    or in a batch. Batches keep up to `max_concurrency` calls in flight: a new
+    prompt starts as soon as any earlier one finishes.
+    """
 
-class Cortex(LLM):
     connection: SnowflakeConnection = None
 
+    pool: Optional[SessionPool] = None
+    """Shared session pool; when set, connections are leased from it"""
+
     model: str = "mistral-7b"
 
+    max_concurrency: int = 8
+    """Maximum number of COMPLETE calls in flight"""
+
+    @contextmanager
+    def _lease_connection(self) -> Iterator[SnowflakeConnection]:
+        if self.pool is not None:
+            with self.pool.lease() as session:
+                yield session.connection
+        else:
+            yield self.connection
+
+    def _generate(
+        self,
+        prompts: List[str],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> LLMResult:
+        def call(prompt: str) -> str:
+            return self._call(prompt, stop=stop, run_manager=run_manager, **kwargs)
+
+        if len(prompts) == 1:
+            completions = [call(prompts[0])]
+        else:
+            with ThreadPoolExecutor(
+                max_workers=min(self.max_concurrency, len(prompts)),
+                thread_name_prefix="cortex",
+            ) as executor:
+                completions = list(executor.map(call, prompts))
+
+        return LLMResult(generations=[[Generation(text=text)] for text in completions])
+
+    async def _acall(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> str:
+        # The blocking call, and any wait for a pooled session, stay off the event loop
+        return await asyncio.to_thread(
+            self._call,
+            prompt,
+            stop=stop,
+            run_manager=run_manager.get_sync() if run_manager else None,
+            **kwargs,
+        )
+
+    async def _agenerate(
+        self,
+        prompts: List[str],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> LLMResult:
+        completions = await asyncio.gather(
+            *_limit_concurrency(
+                [self._acall(prompt, stop, run_manager, **kwargs) for prompt in prompts],
+                self.max_concurrency,
+            )
+        )
+        return LLMResult(generations=[[Generation(text=text)] for text in completions])
+
+
+class Cortex(_CortexBase):
+    _session: Optional[snowpark.Session] = PrivateAttr(default=None)
+    _session_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
     @property
     def _llm_type(self) -> str:
         return "cortex"
@@ -28,15 +142,21 @@ class Cortex(LLM):
         run_manager: Optional[CallbackManagerForLLMRun] = None,
         **kwargs: Any,
     ) -> str:
-        if stop is not None:
-            raise ValueError("stop kwargs are not permitted.")
-
-        res = Complete(
-            self.model,
-            prompt,
-            snowpark.Session.builder.configs({"connection": self.connection}).create(),
-        )
-        return res
+        if self.pool is not None:
+            with self.pool.lease() as session:
+                return _enforce_stop(Complete(self.model, prompt, session), stop)
+
+        return _enforce_stop(Complete(self.model, prompt, self._get_session()), stop)
+
+    def _get_session(self) -> snowpark.Session:
+        # Wrap the connection in a Snowpark session once instead of per call;
+        # _generate calls _call from several threads, so only one of them may create it
+        with self._session_lock:
+            if self._session is None:
+                self._session = snowpark.Session.builder.configs(
+                    {"connection": self.connection}
+                ).create()
+            return self._session
 
     @property
     def _identifying_params(self) -> Mapping[str, Any]:
@@ -44,11 +164,7 @@ class Cortex(LLM):
         return {"connection": self.connection, "model": self.model}
 
 
-class SQLCortex(LLM):
-    connection: SnowflakeConnection = None
-
-    model: str = "mistral-7b"
-
+class SQLCortex(_CortexBase):
     @property
     def _llm_type(self) -> str:
         return "sqlcortex"
@@ -60,14 +176,13 @@ class SQLCortex(LLM):
         run_manager: Optional[CallbackManagerForLLMRun] = None,
         **kwargs: Any,
     ) -> str:
-        if stop is not None:
-            raise ValueError("stop kwargs are not permitted.")
-        q = f"""SELECT SNOWFLAKE.CORTEX.COMPLETE('{self.model}', %(prompt)s) as COMPLETION"""
-
-        res = list(self.connection.cursor(DictCursor).execute(q, {"prompt": prompt}))[
-            0
-        ]["COMPLETION"]
-        return res
+        with self._lease_connection() as connection:
+            res = list(
+                connection.cursor(DictCursor).execute(
+                    _COMPLETE_QUERY, {"model": self.model, "prompt": prompt}
+                )
+            )[0]["COMPLETION"]
+        return _enforce_stop(res, stop)
 
     @property
     def _identifying_params(self) -> Mapping[str, Any]:
@@ -75,4 +190,4 @@ class SQLCortex(LLM):
         return {
             "connection": self.connection,
             "model": self.model,
-        }
\ No newline at end of file
+        }
@@ -0,0 +1,94 @@
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from src.base.pattern import Singleton
+from src.stage.model import StageFile
+
+STAGE_INDEX_TTL = float(os.environ.get("APP_STAGE_INDEX_TTL", 300))
+
+class StageDirectoryIndex(metaclass=Singleton):
+    """Process-wide cache of DIRECTORY(@docs) rows keyed by relative path"""
+
+    def __init__(self, ttl: float = STAGE_INDEX_TTL):
+        self.ttl = ttl
+        self._entries: Dict[str, Tuple[float, StageFile]] = {}
+        self._lock = threading.Lock()
+
+    def get_many(self, names: Iterable[str]) -> Tuple[Dict[str, StageFile], List[str]]:
+        """
+        Split names into cached files and names that must be looked up
+        Returns: (files keyed by name, missing or expired names)
+        """
+        now = time.monotonic()
+        found, missing = {}, []
+        with self._lock:
+            for name in dict.fromkeys(names):
+                entry = self._entries.get(name)
+                if entry is not None and now - entry[0] < self.ttl:
+                    found[name] = entry[1]
+                else:
+                    missing.append(name)
+        return found, missing
+
+    def put_many(self, files: Iterable[StageFile]) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for file in files:
+                self._entries[file.name] = (now, file)
+
+    def invalidate(self, prefix: Optional[str] = None) -> None:
+        """Forget every entry, or only those under a path prefix after the stage changed"""
+        with self._lock:
+            if prefix is None:
+                self._entries.clear()
+                return
+            for name in [name for name in self._entries if name.startswith(prefix)]:
+                del self._entries[name]
+
+class PresignedUrlCache(metaclass=Singleton):
+    """Process-wide cache of presigned stage URLs keyed by (path, expiration)"""
+
+    def __init__(self, refresh_margin: float = 0.1, min_margin: float = 30):
+        """
+        Args:
+            refresh_margin (float): Fraction of the URL lifetime before expiry at which it is re-issued.
+            min_margin (float): Lower bound, in seconds, of that refresh window.
+        """
+        self.refresh_margin = refresh_margin
+        self.min_margin = min_margin
+        self._urls: Dict[Tuple[str, int], Tuple[float, str]] = {}
+        self._lock = threading.Lock()
+
+    def get_many(self, paths: Iterable[str], expiration: int) -> Tuple[Dict[str, str], List[str]]:
+        """
+        Split paths into URLs still safely valid and paths that need presigning
+        Returns: (URLs keyed by path, missing or expiring paths)
+        """
+        now = time.monotonic()
+        found, missing = {}, []
+        with self._lock:
+            for path in dict.fromkeys(paths):
+                entry = self._urls.get((path, expiration))
+                if entry is not None and now < entry[0]:
+                    found[path] = entry[1]
+                else:
+                    missing.append(path)
+        return found, missing
+
+    def put_many(self, urls: Dict[str, str], expiration: int, issued_at: float) -> None:
+        """Store URLs presigned at `issued_at` (time.monotonic) for `expiration` seconds"""
+        margin = max(self.min_margin, expiration * self.refresh_margin)
+        refresh_at = issued_at + expiration - margin
+        with self._lock:
+            for path, url in urls.items():
+                self._urls[(path, expiration)] = (refresh_at, url)
+
+    def invalidate(self, prefix: Optional[str] = None) -> None:
+        """Forget every URL, or only those under a path prefix"""
+        with self._lock:
+            if prefix is None:
+                self._urls.clear()
+                return
+            for key in [key for key in self._urls if key[0].startswith(prefix)]:
+                del self._urls[key]
@@ -1,9 +1,11 @@
 
     
 # src/stage/dao.py
-from typing import List, Optional
+from typing import BinaryIO, Dict, Iterable, List, Optional
 import logging
+import time
 from src.base.dao import BaseDAO
+from src.stage.cache import PresignedUrlCache, StageDirectoryIndex
 from src.stage.model import StageFile
 
 class SnowflakeStageDAO(BaseDAO):
@@ -15,48 +17,158 @@ class SnowflakeStageDAO(BaseDAO):
     def get_stage_files(self,dir) -> List[StageFile]:
         """Get list of all files in stage"""
         try:
-            query = f"LIST @{self.stage_name}/{dir}"
-            result = self.execute_query(query)
-            
-            files = []
-            for row in result:
-                row_dict = {k.lower(): v for k, v in row.asDict().items()}
-                row_dict['name'] = row_dict['name'].split(self.stage_name+'/')[1]
-                files.append(StageFile(**row_dict))
-            
-            return files
+            return self.list_files(dir)
         except Exception as e:
             self.logger.error(f"Failed to list stage files: {str(e)}")
             return []
 
-    def get_file_url(self, file_path: str, expiration: int = 3600) -> Optional[str]:
-        """Get presigned URL for file access"""
+    def list_files(self, dir: str) -> List[StageFile]:
+        """
+        LIST the files under a stage directory
+        Raises: Exception if the listing fails, so callers can tell it apart from an empty directory
+        """
+        query = f"LIST @{self.stage_name}/{dir}"
+        result = self.execute_query(query)
+
+        files = []
+        for row in result:
+            row_dict = {k.lower(): v for k, v in row.asDict().items()}
+            row_dict['name'] = row_dict['name'].split(self.stage_name+'/')[1]
+            files.append(StageFile(**row_dict))
+        return files
+
+    def refresh_directory(self, dirs: Iterable[str]) -> None:
+        """
+        Refresh the stage's directory table under each directory ('' for the whole stage),
+        so files PUT since the last refresh show up in DIRECTORY(@docs)
+        Raises: Exception if a refresh fails
+        """
+        for dir in sorted(set(dirs)):
+            if not dir:
+                self.execute_query(f"ALTER STAGE {self.stage_name} REFRESH")
+                continue
+            # REFRESH SUBPATH does not accept a bind variable
+            subpath = dir.replace("'", "''")
+            self.execute_query(f"ALTER STAGE {self.stage_name} REFRESH SUBPATH = '{subpath}'")
+
+    def get_file_infos(self, file_paths: List[str]) -> Dict[str, StageFile]:
+        """
+        Get stage metadata for many files, querying DIRECTORY(@docs) once for cache misses.
+        The directories of missed files are refreshed first, so recently uploaded files are found.
+        """
+        index = StageDirectoryIndex()
+        files, missing = index.get_many(file_paths)
+        if not missing:
+            return files
         try:
+            self.refresh_directory(name.rsplit('/', 1)[0] + '/' if '/' in name else '' for name in missing)
+            placeholders = ", ".join("?" for _ in missing)
             query = f"""
-            SELECT GET_PRESIGNED_URL(
-                @{self.stage_name}, 
-                '{file_path}',
-                {expiration}
-            ) as url
+            SELECT relative_path, size, md5, last_modified
+            FROM DIRECTORY(@{self.stage_name})
+            WHERE relative_path IN ({placeholders})
             """
-            result = self.execute_query(query)
-            return result[0]['URL'] if result else None
+            result = self.execute_query(query, tuple(missing))
+            found = [
+                StageFile(
+                    name=row['RELATIVE_PATH'],
+                    size=row['SIZE'],
+                    md5=row['MD5'],
+                    last_modified=row['LAST_MODIFIED']
+                ) for row in result
+            ]
+            index.put_many(found)
+            files.update((file.name, file) for file in found)
+        except Exception as e:
+            self.logger.error(f"Failed to get file infos: {str(e)}")
+        return files
+
+    def get_file_info(self, file_path: str) -> Optional[StageFile]:
+        """Get stage metadata for one file"""
+        return self.get_file_infos([file_path]).get(file_path)
+
+    def get_file_urls(self, file_paths: List[str], expiration: int = 3600) -> Dict[str, str]:
+        """
+        Get presigned URLs for many files.
+        Cached URLs are reused until shortly before they expire; the rest are presigned with a single query.
+        Paths are passed as VALUES rather than read from DIRECTORY(@docs), which lags behind uploads until refreshed.
+        """
+        cache = PresignedUrlCache()
+        urls, missing = cache.get_many(file_paths, expiration)
+        if not missing:
+            return urls
+        try:
+            values = ", ".join("(?)" for _ in missing)
+            query = f"""
+            SELECT v.relative_path AS RELATIVE_PATH,
+                   GET_PRESIGNED_URL(@{self.stage_name}, v.relative_path, ?) AS url
+            FROM VALUES {values} AS v(relative_path)
+            """
+            issued_at = time.monotonic()
+            result = self.execute_query(query, (expiration, *missing))
+            presigned = {row['RELATIVE_PATH']: row['URL'] for row in result}
+            cache.put_many(presigned, expiration, issued_at)
+            urls.update(presigned)
+        except Exception as e:
+            self.logger.error(f"Failed to get file URLs: {str(e)}")
+        return urls
+
+    def get_file_url(self, file_path: str, expiration: int = 3600) -> Optional[str]:
+        """Get presigned URL for file access, reusing a cached one until shortly before it expires"""
+        cache = PresignedUrlCache()
+        urls, missing = cache.get_many([file_path], expiration)
+        if not missing:
+            return urls[file_path]
+        try:
+            issued_at = time.monotonic()
+            result = self.execute_query(
+                f"SELECT GET_PRESIGNED_URL(@{self.stage_name}, ?, ?) AS url",
+                (file_path, expiration)
+            )
+            url = result[0]['URL'] if result else None
+            if url:
+                cache.put_many({file_path: url}, expiration, issued_at)
+            return url
         except Exception as e:
             self.logger.error(f"Failed to get file URL: {str(e)}")
             return None
 
+    def put_file(self, file_path: str, session_id: str, parallel: int = 4, auto_compress: bool = False) -> None:
+        """
+        PUT a local file into the session's stage directory
+        Raises: Exception if the PUT fails
+        """
+        file_path = file_path.replace('\\', '/').replace("'", "''")
+        query = f"""
+        PUT 'file://{file_path}' @{self.stage_name}/{session_id}
+        PARALLEL = {int(parallel)}
+        AUTO_COMPRESS = {'TRUE' if auto_compress else 'FALSE'}
+        OVERWRITE = TRUE
+        """
+        self.execute_query(query)
+        StageDirectoryIndex().invalidate(f"{session_id}/")
+
+    def put_stream(self, stream: BinaryIO, file_name: str, session_id: str,
+                   parallel: int = 4, auto_compress: bool = False) -> None:
+        """
+        Upload an in-memory file object into the session's stage directory without a local copy
+        Raises: Exception if the upload fails
+        """
+        stage_location = f"@{self.stage_name}/{session_id}/{file_name}"
+        with self.connector.lease() as session:
+            session.file.put_stream(
+                stream,
+                stage_location,
+                parallel=parallel,
+                auto_compress=auto_compress,
+                overwrite=True
+            )
+        StageDirectoryIndex().invalidate(f"{session_id}/")
+
     def upload_file(self, file_path: str,session_id:str) -> bool:
         """Upload file to stage"""
         try:
-            file_path = file_path.replace('\\', '/').replace("'", "''")
-            
-            # file_path = f"'{file_path}'"
-            query = f"""
-            PUT 'file://{file_path}' @{self.stage_name}/{session_id}
-            AUTO_COMPRESS = FALSE
-            OVERWRITE = TRUE
-            """
-            self.execute_query(query)
+            self.put_file(file_path, session_id)
             return True
         except Exception as e:
             self.logger.error(f"Failed to upload file: {str(e)}")
@@ -72,9 +184,11 @@ class SnowflakeStageDAO(BaseDAO):
             bool: True if removal successful, False otherwise
         """
         try:
-            self.connector.session.sql(f"""
+            self.execute_query(f"""
                 REMOVE @{self.stage_name}/{dir_name}{file_name}
-            """).collect()
+            """)
+            StageDirectoryIndex().invalidate(f"{dir_name}{file_name}")
+            PresignedUrlCache().invalidate(f"{dir_name}{file_name}")
             return True
         except Exception as e:
             self.logger.error(f"File removal failed: {str(e)}")
@@ -87,9 +201,11 @@ class SnowflakeStageDAO(BaseDAO):
             bool: True if removal successful, False otherwise
         """
         try:
-            self.connector.session.sql(f"""
+            self.execute_query(f"""
                 REMOVE @{self.stage_name}/{dir_name}
-            """).collect()
+            """)
+            StageDirectoryIndex().invalidate(dir_name)
+            PresignedUrlCache().invalidate(dir_name)
             return True
         except Exception as e:
             self.logger.error(f"Removing all files failed: {str(e)}")
@@ -1,4 +1,4 @@
-from dataclasses import asdict, dataclass
+from dataclasses import asdict, dataclass, field
 from datetime import datetime
 from typing import Dict, Optional
 
@@ -12,3 +12,16 @@ class StageFile:
     def to_dict(self) -> Dict:
         """Convert ChunkCount to dictionary"""
         return asdict(self)
+
+@dataclass
+class UploadResult:
+    filename: str
+    success: bool
+    error: Optional[str] = None
+    upload_time: datetime = field(default_factory=datetime.now)
+    elapsed: float = 0.0
+    attempts: int = 0
+
+    def to_dict(self) -> Dict:
+        """Convert UploadResult to dictionary"""
+        return asdict(self)
@@ -1,42 +1,41 @@
 import logging
-from typing import List, Dict, Optional
-import os
+from typing import Callable, List, Dict, Optional
 from src.stage.dao import SnowflakeStageDAO
-from src.stage.model import StageFile
+from src.stage.model import StageFile, UploadResult
+from src.stage.uploader import StageUploader
 
 class StageRepository:
     def __init__(self):
         self.stage_dao = SnowflakeStageDAO()
         self.logger     = logging.getLogger(__name__)
         
-    def list_files(self) -> List[StageFile]:
+    def list_files(self, dir: str = "") -> List[StageFile]:
         """Get list of all files in stage"""
-        return self.stage_dao.get_stage_files()
+        return self.stage_dao.get_stage_files(dir)
 
     def get_file_info(self, file_path: str) -> Optional[StageFile]:
         """Get information about specific file"""
-        files = self.stage_dao.get_stage_files()
-        return next((f for f in files if f.name == file_path), None)
+        return self.stage_dao.get_file_info(file_path)
+
+    def get_file_infos(self, file_paths: List[str]) -> Dict[str, StageFile]:
+        """Get information about many files, keyed by path"""
+        return self.stage_dao.get_file_infos(file_paths)
 
     def get_file_url(self, file_path: str, expiration: int = 3600) -> Optional[str]:
         """Get temporary access URL for file"""
         return self.stage_dao.get_file_url(file_path, expiration)
 
-    def upload_files(self, file_paths: List[str]) -> Dict[str, bool]:
+    def get_file_urls(self, file_paths: List[str], expiration: int = 3600) -> Dict[str, str]:
+        """Get temporary access URLs for many files, keyed by path"""
+        return self.stage_dao.get_file_urls(file_paths, expiration)
+
+    def upload_files(self, file_paths: List[str], dir: str = "",
+                     on_progress: Optional[Callable[[UploadResult, int, int], None]] = None) -> List[UploadResult]:
         """
-        Upload multiple files to stage
-        Returns: Dict mapping file paths to success status
+        Upload multiple files to stage concurrently
+        Returns: One UploadResult per file, in input order
         """
-        results = {}
-        for file_path in file_paths:
-            if not os.path.exists(file_path):
-                self.logger.warning(f"File not found: {file_path}")
-                results[file_path] = False
-                continue
-                
-            success = self.stage_dao.upload_file(file_path)
-            results[file_path] = success
-        return results
+        return StageUploader(self.stage_dao).upload_files(file_paths, dir, on_progress=on_progress)
 
     def remove_files(self, file_paths: List[str]) -> Dict[str, bool]:
         """
@@ -51,7 +50,7 @@ class StageRepository:
 
     def get_stage_stats(self) -> Dict:
         """Get stage statistics"""
-        files = self.stage_dao.get_stage_files()
+        files = self.stage_dao.get_stage_files("")
         if not files:
             return {
                 'total_files': 0,
@@ -77,9 +76,9 @@ for file in files:
     print(f"File: {file.name}, Size: {file.size}")
 
 # Upload files
-results = stage_repo.upload_files(["document1.pdf", "document2.pdf"])
-for path, success in results.items():
-    print(f"Upload {path}: {'Success' if success else 'Failed'}")
+results = stage_repo.upload_files(["document1.pdf", "document2.pdf"], dir="<session_id>")
+for result in results:
+    print(f"Upload {result.filename}: {'Success' if result.success else result.error} ({result.elapsed:.1f}s)")
 
 # Get file URL
 url = stage_repo.get_file_url("document1.pdf")
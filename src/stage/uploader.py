@@ -0,0 +1,116 @@
+import logging
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import BinaryIO, Callable, List, Optional, Tuple
+from src.base.connector import TRANSIENT_ERRORS
+from src.stage.dao import SnowflakeStageDAO
+from src.stage.model import UploadResult
+
+class StageUploader:
+    """Upload many local files to the docs stage concurrently, retrying transient failures"""
+
+    def __init__(self, stage_dao: Optional[SnowflakeStageDAO] = None, max_workers: int = 4,
+                 parallel: int = 4, auto_compress: bool = False,
+                 max_retries: int = 3, backoff: float = 1.0):
+        """
+        Args:
+            stage_dao (SnowflakeStageDAO, optional): DAO used for the PUT statements.
+            max_workers (int): Files uploaded at the same time, each on its own pooled session.
+            parallel (int): PUT ... PARALLEL, i.e. threads Snowflake uses per file.
+            auto_compress (bool): Gzip files while uploading.
+            max_retries (int): Extra attempts per file after a connection or timeout error; other errors fail at once.
+            backoff (float): Base delay in seconds, doubled on every retry.
+        """
+        self.stage_dao = stage_dao or SnowflakeStageDAO()
+        self.max_workers = max_workers
+        self.parallel = parallel
+        self.auto_compress = auto_compress
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.logger = logging.getLogger(__name__)
+
+    def upload_files(self, file_paths: List[str], session_id: str,
+                     on_progress: Optional[Callable[[UploadResult, int, int], None]] = None) -> List[UploadResult]:
+        """
+        Upload files into the session's stage directory
+        Args:
+            on_progress: Called as (result, completed, total) whenever a file finishes.
+        Returns: One UploadResult per file, in input order
+        """
+        return self._run(
+            [(os.path.basename(file_path), lambda file_path=file_path: self._put_file(file_path, session_id))
+             for file_path in file_paths],
+            on_progress
+        )
+
+    def upload_streams(self, streams: List[Tuple[str, BinaryIO]], session_id: str,
+                       on_progress: Optional[Callable[[UploadResult, int, int], None]] = None) -> List[UploadResult]:
+        """
+        Upload in-memory file objects (e.g. Streamlit UploadedFile) without writing them to disk
+        Args:
+            streams: (file name, readable binary stream) pairs.
+            on_progress: Called as (result, completed, total) whenever a file finishes.
+        Returns: One UploadResult per stream, in input order
+        """
+        return self._run(
+            [(name, lambda name=name, stream=stream: self._put_stream(stream, name, session_id))
+             for name, stream in streams],
+            on_progress
+        )
+
+    def _run(self, uploads: List[Tuple[str, Callable[[], None]]],
+             on_progress: Optional[Callable[[UploadResult, int, int], None]]) -> List[UploadResult]:
+        results = {}
+        total = len(uploads)
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="stage-upload") as executor:
+            futures = {
+                executor.submit(self._with_retry, filename, upload): idx
+                for idx, (filename, upload) in enumerate(uploads)
+            }
+            for future in as_completed(futures):
+                result = future.result()
+                results[futures[future]] = result
+                if on_progress:
+                    on_progress(result, len(results), total)
+        return [results[idx] for idx in range(total)]
+
+    def _put_file(self, file_path: str, session_id: str) -> None:
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(file_path)
+        self.stage_dao.put_file(file_path, session_id, parallel=self.parallel,
+                                auto_compress=self.auto_compress)
+
+    def _put_stream(self, stream: BinaryIO, file_name: str, session_id: str) -> None:
+        # Rewind so a retry re-sends the whole file
+        stream.seek(0)
+        self.stage_dao.put_stream(stream, file_name, session_id, parallel=self.parallel,
+                                  auto_compress=self.auto_compress)
+
+    def _with_retry(self, filename: str, upload: Callable[[], None]) -> UploadResult:
+        start = time.monotonic()
+        error = None
+        for attempt in range(1, self.max_retries + 2):
+            try:
+                upload()
+                return UploadResult(filename=filename, success=True,
+                                    elapsed=time.monotonic() - start, attempts=attempt)
+            except FileNotFoundError:
+                self.logger.warning(f"File not found: {filename}")
+                return UploadResult(filename=filename, success=False, error="File not found",
+                                    elapsed=time.monotonic() - start, attempts=attempt)
+            except TRANSIENT_ERRORS as e:
+                error = str(e)
+                if attempt <= self.max_retries:
+                    delay = self.backoff * 2 ** (attempt - 1) * (1 + random.random() / 2)
+                    self.logger.warning(f"Upload of {filename} failed (attempt {attempt}), retrying in {delay:.1f}s: {error}")
+                    time.sleep(delay)
+            except Exception as e:
+                self.logger.error(f"Failed to upload {filename}: {str(e)}")
+                return UploadResult(filename=filename, success=False, error=str(e),
+                                    elapsed=time.monotonic() - start, attempts=attempt)
+
+        self.logger.error(f"Failed to upload {filename}: {error}")
+        return UploadResult(filename=filename, success=False, error=error,
+                            elapsed=time.monotonic() - start, attempts=self.max_retries + 1)